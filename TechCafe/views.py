@@ -52,7 +52,7 @@ def GitHubAuthView(request):
 # meet/views.py
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from fastapi_app.queue.queue import enqueue_user, get_queue_length, dequeue_users
+from fastapi_app.queue.sync_queue import enqueue_user, get_queue_length, dequeue_users
 import json
 import traceback
 @api_view(["POST"])
@@ -63,8 +63,9 @@ def join_queue_view(request):
             print(data)
             user_id = data["user_id"]
             domain=data["domain"]
+            room_type=data.get("room_type")
 
-            result = enqueue_user( domain,user_id)
+            result = enqueue_user( domain,user_id,room_type,data.get("rating"))
             return JsonResponse(result, status=200, safe=False)
 
         except Exception as e:
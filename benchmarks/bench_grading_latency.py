@@ -0,0 +1,86 @@
+"""p50/p99 grading latency per language on the local sandbox, before and after
+compiled-harness caching and warm interpreter pools.
+
+Each mode grades SUBMISSIONS copies of a correct solution one at a time
+(latency, not throughput) against the same question, the way repeated
+submissions to one room's question arrive:
+
+  baseline  - full compile of harness + user code, cold interpreter/JVM
+  cached    - C++ precompiled header / cached Java Main, cold start
+  warm      - cached harness plus WARM_POOL_SIZE pre-started processes
+
+Java's cached and warm modes only differ from baseline with
+SANDBOX_JAVA_FAST_PATHS=true. Missing toolchains are skipped. Run as root
+with SANDBOX_UID set to the first of a range of unused uids that can execute
+them.
+
+    SANDBOX_UID=60000 SANDBOX_CACHE_DIR=/tmp/bench-cache python benchmarks/bench_grading_latency.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app.code_editor import sandbox  # noqa: E402
+from fastapi_app.code_editor.execution import LocalSandboxBackend, build_program, parse_harness_output  # noqa: E402
+from fastapi_app.questiongenerator.fake_llm import fake_question  # noqa: E402
+
+SUBMISSIONS = int(os.getenv("SUBMISSIONS", 50))
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", 2))
+LANGUAGES = os.getenv("LANGUAGES", "python,c++,java").split(",")
+TOOLCHAINS = {"python": sandbox.SANDBOX_PYTHON, "c++": sandbox.SANDBOX_CXX, "java": sandbox.SANDBOX_JAVAC}
+MODES = {"baseline": (False, 0), "cached": (True, 0), "warm": (True, WARM_POOL_SIZE)}
+
+
+def percentile(ordered, p):
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+
+async def bench(backend, language, question, mode):
+    harness_cache, pool_size = MODES[mode]
+    sandbox.SANDBOX_HARNESS_CACHE = harness_cache
+    sandbox.SANDBOX_WARM_POOL_SIZE = pool_size
+    for pool in sandbox.warm_pools.values():
+        pool.size = pool_size
+
+    code = question["reference_solution"][language]
+    main = question["boilerplate_code_main"][language]
+    payload = {
+        "language": language,
+        "files": [{"content": build_program(language, code, main)}],
+        "harness": {"main": main, "code": code, "skeleton": question["boilerplate_code_user"][language]},
+    }
+    await backend.run(payload)  # builds cached artifacts / fills the pool
+    await asyncio.sleep(1)
+
+    latencies, passed = [], 0
+    for _ in range(SUBMISSIONS):
+        started = time.perf_counter()
+        result = await backend.run(payload)
+        latencies.append((time.perf_counter() - started) * 1000)
+        passed += parse_harness_output(result.get("run", {}).get("stdout", ""))[0] == "true"
+        await asyncio.sleep(0.05 if pool_size else 0)  # let the pool refill, as between real submissions
+    latencies.sort()
+    print(
+        f"{language:>6} {mode:>8}: p50={percentile(latencies, 50):7.1f}ms "
+        f"p99={percentile(latencies, 99):7.1f}ms  {passed}/{SUBMISSIONS} passed"
+    )
+
+
+async def main():
+    backend = LocalSandboxBackend()
+    question = fake_question(debugging=False)
+    for language in LANGUAGES:
+        if not shutil.which(TOOLCHAINS[language]):
+            print(f"{language:>6}: skipped, {TOOLCHAINS[language]} not found")
+            continue
+        for mode in MODES:
+            await bench(backend, language, question, mode)
+    await backend.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
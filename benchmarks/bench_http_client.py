@@ -0,0 +1,102 @@
+"""Per-call latency: a new httpx.AsyncClient per request vs the shared pool.
+
+Starts a local HTTP/1.1 stand-in for Piston that answers every request with a
+Piston-shaped JSON body. HANDSHAKE_MS is added once per new connection to
+stand in for the TCP+TLS handshake a real upstream costs; the shared client
+pays it once per pooled connection, a fresh client pays it on every call.
+
+    python benchmarks/bench_http_client.py
+"""
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx  # noqa: E402
+from fastapi_app.http_clients import close_clients, get_client  # noqa: E402
+
+CALLS = int(os.getenv("CALLS", 500))
+CONCURRENCY = int(os.getenv("CONCURRENCY", 10))
+HANDSHAKE_MS = float(os.getenv("HANDSHAKE_MS", 20))
+SERVICE_MS = float(os.getenv("SERVICE_MS", 2))
+
+BODY = json.dumps({"language": "python", "version": "3.10.0", "run": {"output": "true\n", "code": 0}}).encode()
+connections = 0
+
+
+async def handle(reader, writer):
+    global connections
+    connections += 1
+    await asyncio.sleep(HANDSHAKE_MS / 1000)
+    try:
+        while True:
+            headers = await reader.readuntil(b"\r\n\r\n")
+            length = 0
+            for line in headers.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            await reader.readexactly(length)
+            await asyncio.sleep(SERVICE_MS / 1000)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                + f"Content-Length: {len(BODY)}\r\n\r\n".encode() + BODY
+            )
+            await writer.drain()
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    finally:
+        writer.close()
+
+
+async def run(label, call):
+    global connections
+    connections = 0
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            started = time.perf_counter()
+            await call()
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(CALLS)))
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    print(
+        f"{label:>22}: median={statistics.median(latencies):.2f}ms "
+        f"p99={latencies[int(len(latencies) * 0.99) - 1]:.2f}ms "
+        f"throughput={CALLS / elapsed:.0f}/s connections={connections}"
+    )
+    return statistics.median(latencies)
+
+
+async def main():
+    server = await asyncio.start_server(handle, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/api/v2/execute"
+    payload = {"language": "python", "version": "3.10.0", "files": [{"content": "print('true')"}]}
+
+    async def fresh_client():
+        async with httpx.AsyncClient() as client:
+            (await client.post(url, json=payload)).json()
+
+    async def shared_client():
+        (await get_client("piston").post(url, json=payload)).json()
+
+    print(f"{CALLS} calls, concurrency {CONCURRENCY}, handshake {HANDSHAKE_MS}ms, service {SERVICE_MS}ms")
+    fresh = await run("new client per call", fresh_client)
+    shared = await run("shared pooled client", shared_client)
+    print(f"saved per call (median): {fresh - shared:.2f}ms")
+
+    await close_clients()
+    server.close()
+    await server.wait_closed()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,58 @@
+"""Submission throughput of the local sandbox backend, per language.
+
+Runs SUBMISSIONS graded programs (a solve() plus a 10-case harness printing
+per-test JSON lines and true / false-<i>, the shape generated questions use)
+through the local execution backend with SANDBOX_WORKERS concurrent workers,
+and reports submissions/s overall and per core. Needs python3, g++ and a JDK on PATH for
+the respective languages; missing toolchains are skipped. Run as root with
+SANDBOX_UID set to the first of a range of unused uids that can execute them.
+
+    SANDBOX_UID=60000 SANDBOX_WORKERS=4 python benchmarks/bench_local_sandbox.py
+"""
+import asyncio
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app.code_editor import sandbox  # noqa: E402
+from fastapi_app.code_editor.execution import LocalSandboxBackend, build_program, parse_harness_output  # noqa: E402
+from fastapi_app.questiongenerator.fake_llm import fake_question  # noqa: E402
+
+SUBMISSIONS = int(os.getenv("SUBMISSIONS", 200))
+LANGUAGES = os.getenv("LANGUAGES", "python,c++,java").split(",")
+TOOLCHAINS = {"python": sandbox.SANDBOX_PYTHON, "c++": sandbox.SANDBOX_CXX, "java": sandbox.SANDBOX_JAVAC}
+
+
+async def bench(backend, language, question):
+    program = build_program(language, question["reference_solution"][language], question["boilerplate_code_main"][language])
+    payload = {"language": language, "files": [{"content": program}]}
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(backend.run(payload) for _ in range(SUBMISSIONS)))
+    elapsed = time.perf_counter() - started
+
+    passed = sum(parse_harness_output(r.get("run", {}).get("stdout", ""))[0] == "true" for r in results)
+    rate = SUBMISSIONS / elapsed
+    cores = min(sandbox.SANDBOX_WORKERS, os.cpu_count() or 1)
+    print(
+        f"{language:>6}: {SUBMISSIONS} submissions in {elapsed:.2f}s = {rate:.1f}/s "
+        f"({rate / cores:.1f}/s per core over {cores} cores), {passed} passed"
+    )
+
+
+async def main():
+    print(f"workers={sandbox.SANDBOX_WORKERS} cpus={os.cpu_count()}")
+    backend = LocalSandboxBackend()
+    question = fake_question(debugging=False)
+    for language in LANGUAGES:
+        if not shutil.which(TOOLCHAINS[language]):
+            print(f"{language:>6}: skipped, {TOOLCHAINS[language]} not found")
+            continue
+        await bench(backend, language, question)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,62 @@
+"""Enqueue-to-room latency of the matchmaking worker.
+
+Runs the real worker against a local redis-server and mongod and waits on the
+same SSE events the API uses. Compare the two modes:
+
+    REDIS_HOST=localhost REDIS_PORT=6379 REDIS_SSL=false \\
+    MONGO_URL=mongodb://localhost:27017 \\
+    MATCHMAKING_EVENT_DRIVEN=false python benchmarks/bench_match_latency.py
+
+and the same with MATCHMAKING_EVENT_DRIVEN=true (the default).
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app.queue import matchmaking_worker  # noqa: E402
+from fastapi_app.queue.queue import enqueue_user  # noqa: E402
+from fastapi_app.queue.router import match_notification_listener, user_sse_connections  # noqa: E402
+
+PAIRS = int(os.getenv("PAIRS", 50))
+GAP = float(os.getenv("GAP", 0.2))  # seconds between pairs
+
+
+async def one_pair(domain):
+    latencies = []
+    waiters = {}
+    for _ in range(2):
+        user_id = f"bench-{uuid.uuid4()}"
+        waiters[user_id] = asyncio.Event()
+        user_sse_connections[user_id] = {"event": waiters[user_id], "room_id": None}
+    start = time.perf_counter()
+    for user_id in waiters:
+        await enqueue_user(domain, user_id)
+    for event in waiters.values():
+        await event.wait()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+async def main():
+    worker = asyncio.create_task(matchmaking_worker.matchmaking_loop())
+    listener = asyncio.create_task(match_notification_listener())
+    domain = f"bench{uuid.uuid4().hex[:8]}"
+    tasks = []
+    for _ in range(PAIRS):
+        tasks.append(asyncio.create_task(one_pair(domain)))
+        await asyncio.sleep(GAP)
+    samples = sorted(ms for pair in await asyncio.gather(*tasks) for ms in pair)
+    worker.cancel()
+    listener.cancel()
+    mode = "event-driven" if matchmaking_worker.EVENT_DRIVEN else "polling"
+    p99 = samples[max(int(len(samples) * 0.99) - 1, 0)]
+    print(f"{mode}: n={len(samples)} median={statistics.median(samples):.1f}ms p99={p99:.1f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
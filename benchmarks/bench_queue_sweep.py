@@ -0,0 +1,59 @@
+"""Sweep latency: KEYS "queue:*" vs the active_queues registry.
+
+Needs a throwaway local redis-server (the target DB is flushed):
+
+    REDIS_URL=redis://localhost:6379/15 python benchmarks/bench_queue_sweep.py
+"""
+import os
+import statistics
+import time
+
+import redis
+
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/15")
+UNRELATED_KEYS = int(os.getenv("UNRELATED_KEYS", 100_000))
+ACTIVE_QUEUES = int(os.getenv("ACTIVE_QUEUES", 20))
+REPEAT = int(os.getenv("REPEAT", 200))
+
+ACTIVE_QUEUES_KEY = "active_queues"
+
+
+def populate(r):
+    r.flushdb()
+    pipe = r.pipeline(transaction=False)
+    for i in range(UNRELATED_KEYS):
+        pipe.set(f"session:{i}", "x")
+        if i % 10_000 == 0:
+            pipe.execute()
+    for i in range(ACTIVE_QUEUES):
+        key = f"queue:domain{i}:any"
+        pipe.zadd(key, {f"u{i}": time.time()})
+        pipe.sadd(ACTIVE_QUEUES_KEY, key)
+    pipe.execute()
+
+
+def timed(fn):
+    samples = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return statistics.median(samples), samples[int(len(samples) * 0.99) - 1]
+
+
+def main():
+    r = redis.Redis.from_url(REDIS_URL)
+    populate(r)
+    print(f"{UNRELATED_KEYS} unrelated keys, {ACTIVE_QUEUES} active queues, {REPEAT} sweeps")
+    for name, fn in [
+        ("KEYS queue:*", lambda: r.keys("queue:*")),
+        ("SMEMBERS active_queues", lambda: r.smembers(ACTIVE_QUEUES_KEY)),
+    ]:
+        p50, p99 = timed(fn)
+        print(f"{name:<24} p50={p50:.3f}ms p99={p99:.3f}ms")
+    r.flushdb()
+
+
+if __name__ == "__main__":
+    main()
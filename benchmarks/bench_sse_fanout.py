@@ -0,0 +1,57 @@
+"""Publish-to-SSE-wakeup latency with many waiting clients.
+
+Registers WAITING fake SSE clients in this process, runs the real match
+notification listener and publishes one room per pair of clients through
+publish_match, the way the matcher does. Needs a local redis-server:
+
+    REDIS_HOST=localhost REDIS_PORT=6379 REDIS_SSL=false \\
+    MONGO_URL=mongodb://localhost:27017 python benchmarks/bench_sse_fanout.py
+"""
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi_app.queue.queue import publish_match  # noqa: E402
+from fastapi_app.queue.router import match_notification_listener, user_sse_connections  # noqa: E402
+
+WAITING = int(os.getenv("WAITING", 10_000))
+ROOMS_PER_SECOND = int(os.getenv("ROOMS_PER_SECOND", 1000))
+
+
+async def main():
+    for i in range(WAITING):
+        user_sse_connections[f"bench-{i}"] = {"event": asyncio.Event(), "room_id": None}
+    listener = asyncio.create_task(match_notification_listener())
+    await asyncio.sleep(0.5)  # let the subscription settle
+
+    sent_at = {}
+    latencies = []
+
+    async def wait(user_id):
+        entry = user_sse_connections[user_id]
+        await entry["event"].wait()
+        latencies.append((time.perf_counter() - sent_at[entry["room_id"]]) * 1000)
+
+    waiters = [asyncio.create_task(wait(uid)) for uid in list(user_sse_connections)]
+    for i in range(0, WAITING, 2):
+        room_id = f"room-{i}"
+        sent_at[room_id] = time.perf_counter()
+        await publish_match(room_id, [f"bench-{i}", f"bench-{i + 1}"])
+        await asyncio.sleep(1 / ROOMS_PER_SECOND)
+    await asyncio.gather(*waiters)
+    listener.cancel()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99) - 1]
+    print(
+        f"{WAITING} waiting clients, {ROOMS_PER_SECOND} rooms/s: "
+        f"median={statistics.median(latencies):.2f}ms p99={p99:.2f}ms max={latencies[-1]:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,171 @@
+"""Offline matchmaking simulation.
+
+Drives the real queue.py / matchmaking_worker.py code against in-process
+stand-ins (fakeredis with Lua support, mongomock-motor), so it runs on a
+laptop with no network and no servers:
+
+    pip install -r benchmarks/requirements.txt
+    python benchmarks/matchmaking_sim.py --users 4000 --domains 20 --rate 500
+
+Reports rooms per second, enqueue-to-room latency percentiles and Redis /
+Mongo round trips per room. Latencies include the worker's own scheduling
+on the shared event loop, which is what a regression would show up in.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import sys
+import time
+
+# The app modules read these at import time; nothing connects to them.
+os.environ.setdefault("REDIS_HOST", "localhost")
+os.environ.setdefault("REDIS_PORT", "6379")
+os.environ.setdefault("REDIS_SSL", "false")
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakeredis  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+from redis.asyncio.client import Pipeline  # noqa: E402
+
+from fastapi_app.database import mongo  # noqa: E402
+from fastapi_app.queue import matchmaking_worker  # noqa: E402
+from fastapi_app.queue.queue import enqueue_user  # noqa: E402
+from fastapi_app.queue.redis_connection import async_redis_client  # noqa: E402
+from fastapi_app.queue.router import match_notification_listener, user_sse_connections  # noqa: E402
+
+round_trips = {"redis": 0, "mongo": 0}
+
+
+class CountingCollection:
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            round_trips["mongo"] += 1
+            return attr(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase:
+    def __init__(self, database):
+        self._database = database
+
+    def __getattr__(self, name):
+        return CountingCollection(getattr(self._database, name))
+
+
+def install_stand_ins():
+    # Point the app's pooled client at an in-process fake server. Scripts are
+    # bound to the client object, so swapping its pool is enough.
+    fake = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer())
+    async_redis_client.connection_pool = fake.connection_pool
+
+    execute_command = async_redis_client.execute_command
+
+    async def counted_command(*args, **kwargs):
+        round_trips["redis"] += 1
+        return await execute_command(*args, **kwargs)
+    async_redis_client.execute_command = counted_command
+
+    pipeline_execute = Pipeline.execute
+
+    async def counted_pipeline(self, *args, **kwargs):
+        round_trips["redis"] += 1
+        return await pipeline_execute(self, *args, **kwargs)
+    Pipeline.execute = counted_pipeline
+
+    db = CountingDatabase(AsyncMongoMockClient()["tech_cafe"])
+    mongo.db = db
+    matchmaking_worker.db = db
+
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+
+async def simulate(args):
+    worker = asyncio.create_task(matchmaking_worker.matchmaking_loop())
+    listener = asyncio.create_task(match_notification_listener())
+    await asyncio.sleep(0.2)  # initial sweep and subscription
+    round_trips.update(redis=0, mongo=0)
+
+    domains = [f"domain{i}" for i in range(args.domains)]
+    latencies = []
+    matched_at = []
+
+    async def wait_for_room(user_id, enqueued):
+        await user_sse_connections[user_id]["event"].wait()
+        now = time.perf_counter()
+        latencies.append((now - enqueued) * 1000)
+        matched_at.append(now)
+
+    waiters = []
+    start = time.perf_counter()
+    for i in range(args.users):
+        user_id = f"sim-{i}"
+        user_sse_connections[user_id] = {"event": asyncio.Event(), "room_id": None}
+        room_type = random.choice(["coding", "debugging"]) if args.room_types else None
+        rating = random.gauss(1000, 200) if args.ratings else None
+        enqueued = time.perf_counter()
+        await enqueue_user(random.choice(domains), user_id, room_type, rating)
+        waiters.append(asyncio.create_task(wait_for_room(user_id, enqueued)))
+        await asyncio.sleep(random.expovariate(args.rate))
+    arrivals_done = time.perf_counter()
+
+    # Odd users out in each queue never match; stop once the rest have.
+    _, pending = await asyncio.wait(waiters, timeout=args.drain)
+    for task in pending:
+        task.cancel()
+    worker.cancel()
+    listener.cancel()
+
+    rooms = len(latencies) // matchmaking_worker.ROOM_SIZE
+    elapsed = (max(matched_at) if matched_at else arrivals_done) - start
+    latencies.sort()
+    report = [
+        f"users={args.users} domains={args.domains} rate={args.rate}/s "
+        f"ratings={args.ratings} room_types={args.room_types}",
+        f"rooms={rooms} unmatched={len(pending)} rooms/s={rooms / elapsed:.1f}",
+    ]
+    if latencies:
+        report.append(
+            f"enqueue->room ms: p50={statistics.median(latencies):.2f} "
+            f"p90={percentile(latencies, 90):.2f} p99={percentile(latencies, 99):.2f} "
+            f"max={latencies[-1]:.2f}")
+    if rooms:
+        # Includes the enqueues themselves (one script call per user).
+        report.append(
+            f"round trips/room: redis={round_trips['redis'] / rooms:.2f} "
+            f"mongo={round_trips['mongo'] / rooms:.2f}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--domains", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=500, help="arrivals per second")
+    parser.add_argument("--ratings", action="store_true", help="give users random ratings")
+    parser.add_argument("--room-types", action="store_true", help="pick coding/debugging per user")
+    parser.add_argument("--drain", type=float, default=5, help="seconds to wait for stragglers")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    random.seed(args.seed)
+    install_stand_ins()
+    with contextlib.redirect_stdout(io.StringIO()):  # the worker's own prints
+        report = asyncio.run(simulate(args))
+    print("\n".join(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
-import httpx
 from bson import ObjectId
 from typing import Literal
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from fastapi_app.database.mongo import db
+from fastapi_app.queue.queue import release_users_from_room
+from fastapi_app.code_editor.execution import UnsupportedLanguage, build_program, parse_harness_output
+from fastapi_app.code_editor.runtime_stats import record_runtime, runtime_percentile
+from fastapi_app.code_editor.verdict_cache import execute_cached
+from fastapi_app.questiongenerator.question_store import content_hash, get_room_question
 import requests
 from datetime import datetime
 
@@ -24,8 +28,47 @@ class SubmitCodeRequest(BaseModel):
 router = APIRouter()
 questions_collection = db.rooms
 
+# Signals an executor uses to stop a run that ran out of time (the local
+# sandbox and Piston SIGKILL on wall-clock limits, RLIMIT_CPU sends SIGXCPU).
+TIMEOUT_SIGNALS = ("SIGKILL", "SIGXCPU")
+
+
+def is_timeout(run) -> bool:
+    stderr = run.get("stderr") or ""
+    if "output limit exceeded" in stderr:
+        return False
+    return run.get("status") == "TO" or run.get("signal") in TIMEOUT_SIGNALS
+
+
+def summarize_tests(tests, wall_ms=None):
+    # Totals over the per-test lines the harness printed. The user's code
+    # writes to the same stdout and these numbers go into the shared runtime
+    # stats, so they are only used when they look like the harness's own: one
+    # line per test numbered from 0 or 1 in order, each with a time. A line
+    # the user adds then either breaks the numbering or only adds time, and
+    # the total may not exceed what the executor measured for the whole run.
+    indices = [t.get("test") for t in tests]
+    if not tests or indices[0] not in (0, 1) or indices != list(range(indices[0], indices[0] + len(tests))):
+        return None
+    elapsed = [t["elapsed_ms"] for t in tests if isinstance(t.get("elapsed_ms"), (int, float))]
+    rss = [t["peak_rss_kb"] for t in tests if isinstance(t.get("peak_rss_kb"), (int, float))]
+    if len(elapsed) != len(tests) or min(elapsed) < 0:
+        return None
+    if wall_ms is not None and sum(elapsed) > wall_ms:
+        return None
+    return {
+        "elapsed_ms": round(sum(elapsed), 3),
+        "max_test_ms": round(max(elapsed), 3),
+        "peak_rss_kb": max(rss) if rss else None,
+    }
+
 @router.post("/submit-code")
 async def submit_code(payload: SubmitCodeRequest):
+    return await grade_submission(payload)
+
+
+async def grade_submission(payload: SubmitCodeRequest):
+    # Shared by /submit-code and the submission job graders.
     # 🔍 Get the room document containing this user
     document = await questions_collection.find_one({"users.user_id": payload.user_id})
     if not document:
@@ -33,8 +76,8 @@ async def submit_code(payload: SubmitCodeRequest):
 
     # 🎯 Fetch the correct question based on question_id (0,1,2)
     try:
-        question = document["questions"][int(payload.question_id)]
-    except (IndexError, ValueError):
+        question = await get_room_question(document, int(payload.question_id))
+    except (IndexError, KeyError, ValueError):
         raise HTTPException(status_code=400, detail="Invalid question index.")
 
     # 🔧 Merge user code with backend-only main boilerplate
@@ -42,41 +85,39 @@ async def submit_code(payload: SubmitCodeRequest):
     if not boilerplate_main:
         raise HTTPException(status_code=400, detail="Language not supported.")
 
-    full_code = (
-        boilerplate_main + "\n\n" + payload.code
-        if payload.language == "java"
-        else payload.code + "\n\n" + boilerplate_main
-    )
-
-    # 🛠 Get latest runtime version for the language
-    async with httpx.AsyncClient() as client:
-        runtimes_response = await client.get("https://emkc.org/api/v2/piston/runtimes")
-        runtimes = runtimes_response.json()
+    full_code = build_program(payload.language, payload.code, boilerplate_main)
 
-    matching_runtimes = [
-        r for r in runtimes if r["language"] == payload.language]
-    if not matching_runtimes:
+    # 🚀 Run it in-process on the configured execution backend, unless the
+    # same code was already run against this question
+    try:
+        result = await execute_cached(
+            question, payload.language, payload.code, full_code,
+            harness={
+                "main": boilerplate_main,
+                "code": payload.code,
+                "skeleton": question.get("boilerplate_code_user", {}).get(payload.language),
+            },
+        )
+    except UnsupportedLanguage:
         raise HTTPException(status_code=400, detail="No runtime found.")
-    latest_version = matching_runtimes[-1]["version"]
-
-    # 🚀 Compile code via local runner
-    compile_payload = {
-        "language": payload.language,
-        "version": latest_version,
-        "files": [{"content": full_code}]
-    }
-
-    async with httpx.AsyncClient() as client:
-        response = await client.post("http://localhost:8000/run-code", json=compile_payload)
-        result = response.json()
-        output = result.get("run", {}).get("output", "").strip()
+    run = result.get("run") or {}
+    compile_stage = result.get("compile") or {}
+    output, tests = parse_harness_output(run["stdout"] if "stdout" in run else run.get("output", ""))
+    runtime = summarize_tests(tests, run.get("wall_time"))
+    question_hash = question.get("content_hash") or content_hash(question)
 
     # ✅ Success case
-    if output == "true":
-        await questions_collection.update_one(
+    if output == "true" and not any(t.get("passed") is False for t in tests):
+        solved = await questions_collection.update_one(
             {"room_id": payload.room_id, "users.user_id": payload.user_id},
             {"$addToSet": {"users.$.questions_solved": payload.question_id}}
         )
+        # Only the first accepted run per player and question goes into the
+        # runtime distribution; resubmissions are just ranked against it.
+        if runtime and solved.modified_count:
+            runtime["ranking"] = await record_runtime(question_hash, payload.language, runtime["elapsed_ms"])
+        elif runtime:
+            runtime["ranking"] = await runtime_percentile(question_hash, payload.language, runtime["elapsed_ms"])
 
         # 🔄 Recheck if user finished all 3 questions
         updated_room = await questions_collection.find_one({"room_id": payload.room_id})
@@ -94,9 +135,13 @@ async def submit_code(payload: SubmitCodeRequest):
                     }
                 }
             )
+            await release_users_from_room([u["user_id"] for u in updated_room["users"]])
             return {
                 "all_test_cases_passed": True,
                 "result": "✅ You solved all 3 questions!",
+                "verdict": "passed",
+                "tests": tests,
+                "runtime": runtime,
                 "challenge_over": True,
                 "popup": {
                     "message": "Challenge over!",
@@ -105,12 +150,37 @@ async def submit_code(payload: SubmitCodeRequest):
                 }
             }
 
-        return {"result": "✅ Question passed!", "challenge_over": False}
+        return {
+            "result": "✅ Question passed!",
+            "verdict": "passed",
+            "tests": tests,
+            "runtime": runtime,
+            "challenge_over": False,
+        }
 
     # ❌ Failed hidden test case
     elif output.startswith("false-"):
         failed_case = output.split("-")[1]
-        return {"result": f"❌ Hidden test case failed at case #{failed_case}."}
+        return {
+            "result": f"❌ Hidden test case failed at case #{failed_case}.",
+            "verdict": "failed",
+            "failed_case": int(failed_case) if failed_case.isdigit() else None,
+            "tests": tests,
+        }
+
+    # ⏱️ Killed before printing a verdict
+    if is_timeout(run):
+        return {
+            "result": f"⏱️ Time limit exceeded after {len(tests)} test case(s).",
+            "verdict": "timeout",
+            "tests": tests,
+        }
+
+    # ❌ Compiler / runtime errors
+    if compile_stage.get("code"):
+        return {"result": "❌ Compilation failed.", "verdict": "compile_error", "tests": tests}
+    if run.get("code") or run.get("signal"):
+        return {"result": "❌ Runtime error.", "verdict": "runtime_error", "tests": tests}
 
     # ❌ Unknown compiler output
-    return {"result": "❌ Unexpected output format"}
+    return {"result": "❌ Unexpected output format", "verdict": "unexpected_output", "tests": tests}
@@ -0,0 +1,128 @@
+import json
+import os
+import time
+from fastapi_app import metrics
+from fastapi_app.code_editor.runtimes import get_runtime_version
+from fastapi_app.code_editor import sandbox
+from fastapi_app.http_clients import get_client
+
+# In-process code execution used by /run-code, submit-code and question
+# validation. Requests and results use Piston's /execute shape whatever the
+# backend, selected with CODE_EXECUTION_BACKEND.
+CODE_EXECUTION_BACKEND = os.getenv("CODE_EXECUTION_BACKEND", "piston")
+PISTON_URL = os.getenv("PISTON_URL", "https://emkc.org/api/v2/piston/execute")
+PISTON_TIMEOUT = float(os.getenv("PISTON_TIMEOUT", 30))
+STUB_EXECUTION_OUTPUT = os.getenv("STUB_EXECUTION_OUTPUT", "true")
+
+
+class UnsupportedLanguage(Exception):
+    pass
+
+
+def build_program(language: str, code: str, boilerplate_main: str) -> str:
+    # Java needs Main (and its imports) first; the others define the user's
+    # function before the main that calls it.
+    if language == "java":
+        return boilerplate_main + "\n\n" + code
+    return code + "\n\n" + boilerplate_main
+
+
+def parse_harness_output(stdout: str):
+    # Harnesses print a JSON line per test case ({"test", "passed",
+    # "elapsed_ms", "peak_rss_kb"}) and then the "true" / "false-<i>" verdict.
+    # Older questions only print the verdict, so tests may come back empty.
+    # Returns (verdict line, tests); anything else the user printed is ignored.
+    verdict = ""
+    tests = []
+    for line in stdout.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("{"):
+            try:
+                test = json.loads(line)
+            except ValueError:
+                test = None
+            if isinstance(test, dict) and "test" in test:
+                tests.append(test)
+                continue
+        verdict = line
+    return verdict, tests
+
+
+class PistonBackend:
+    name = "piston"
+
+    async def run(self, payload):
+        payload = {k: v for k, v in payload.items() if k != "harness"}
+        if not payload.get("version"):
+            version = await get_runtime_version(payload["language"])
+            if not version:
+                raise UnsupportedLanguage(payload["language"])
+            payload = {**payload, "version": version}
+        response = await get_client("piston").post(PISTON_URL, json=payload, timeout=PISTON_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+
+
+class LocalSandboxBackend:
+    # Subprocesses on this host; see sandbox.py for the limits applied.
+    name = "local"
+
+    def __init__(self):
+        sandbox.check_isolation()
+
+    async def run(self, payload):
+        if payload["language"] not in sandbox.SOURCE_NAMES:
+            raise UnsupportedLanguage(payload["language"])
+        return await sandbox.run(payload)
+
+    async def close(self):
+        await sandbox.close_warm_pools()
+
+
+class StubBackend:
+    # Runs nothing and prints STUB_EXECUTION_OUTPUT for every program; for
+    # local development and load tests without an execution service.
+    name = "stub"
+
+    async def run(self, payload):
+        output = STUB_EXECUTION_OUTPUT + "\n"
+        return {
+            "language": payload["language"],
+            "version": payload.get("version") or "stub",
+            "run": {"stdout": output, "stderr": "", "output": output, "code": 0, "signal": None},
+        }
+
+
+BACKENDS = {
+    "piston": PistonBackend,
+    "local": LocalSandboxBackend,
+    "stub": StubBackend,
+}
+
+backend = BACKENDS[CODE_EXECUTION_BACKEND]()
+
+
+async def run_code(payload):
+    started = time.perf_counter()
+    try:
+        return await backend.run(payload)
+    finally:
+        metrics.increment(f"executions_{backend.name}")
+        metrics.observe("execution_ms", (time.perf_counter() - started) * 1000)
+
+
+async def close_backend():
+    if hasattr(backend, "close"):
+        await backend.close()
+
+
+async def execute(language: str, source: str, version: str = None, harness=None):
+    # harness ({"main", "code"}: the two halves of source, plus the question's
+    # "skeleton" for the user's half) lets the local backend reuse a compiled
+    # harness; other backends ignore it.
+    payload = {"language": language, "version": version, "files": [{"content": source}]}
+    if harness:
+        payload["harness"] = harness
+    return await run_code(payload)
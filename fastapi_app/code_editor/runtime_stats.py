@@ -0,0 +1,64 @@
+import math
+import os
+from fastapi_app.queue.redis_connection import async_redis_client
+
+# Runtime distribution of accepted submissions, one small Redis hash per
+# (question, language): field = log bucket, value = count. Buckets grow by
+# 2**(1/4) (~19%) so a question needs a few dozen fields whatever the number
+# of submissions, and percentiles are approximate to within a bucket.
+RUNTIME_BUCKETS_PER_DOUBLING = int(os.getenv("RUNTIME_BUCKETS_PER_DOUBLING", 4))
+RUNTIME_STATS_TTL = int(os.getenv("RUNTIME_STATS_TTL", 90 * 24 * 3600))
+
+
+def runtime_key(question_hash: str, language: str) -> str:
+    return f"runtime_hist:{question_hash}:{language}"
+
+
+def bucket_of(elapsed_ms: float) -> int:
+    return int(math.log2(1 + max(elapsed_ms, 0.0)) * RUNTIME_BUCKETS_PER_DOUBLING)
+
+
+def bucket_ms(bucket: int) -> float:
+    # Midpoint of the bucket, in ms.
+    return round(2 ** ((bucket + 0.5) / RUNTIME_BUCKETS_PER_DOUBLING) - 1, 3)
+
+
+def summarize(histogram: dict, elapsed_ms: float):
+    counts = {int(b): int(c) for b, c in histogram.items()}
+    total = sum(counts.values())
+    if not total:
+        return None
+    own = bucket_of(elapsed_ms)
+    slower = sum(c for b, c in counts.items() if b > own)
+    # Ties count half, so a lone submission sits at 50% rather than 0 or 100.
+    tied = counts.get(own, 0)
+    percentiles = {}
+    seen = 0
+    wanted = [(50, total * 0.5), (90, total * 0.9), (99, total * 0.99)]
+    for b in sorted(counts):
+        seen += counts[b]
+        while wanted and seen >= wanted[0][1]:
+            percentiles[f"p{wanted.pop(0)[0]}_ms"] = bucket_ms(b)
+    return {
+        "submissions": total,
+        "faster_than_percent": round(100 * (slower + tied / 2) / total, 1),
+        **percentiles,
+    }
+
+
+async def record_runtime(question_hash: str, language: str, elapsed_ms: float):
+    # Adds this runtime and ranks it against everything recorded so far,
+    # including itself.
+    key = runtime_key(question_hash, language)
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        pipe.hincrby(key, bucket_of(elapsed_ms), 1)
+        pipe.expire(key, RUNTIME_STATS_TTL)
+        pipe.hgetall(key)
+        _, _, histogram = await pipe.execute()
+    return summarize(histogram, elapsed_ms)
+
+
+async def runtime_percentile(question_hash: str, language: str, elapsed_ms: float):
+    # Ranks a runtime without recording it (repeat solves, cached verdicts).
+    histogram = await async_redis_client.hgetall(runtime_key(question_hash, language))
+    return summarize(histogram, elapsed_ms)
@@ -0,0 +1,74 @@
+import asyncio
+import os
+import time
+from fastapi import APIRouter, Header, HTTPException
+from fastapi_app.http_clients import get_client
+
+# Piston runtime catalog, indexed by language (and alias) -> latest version.
+# Loaded at startup and refreshed in the background; lookups never wait on
+# Piston once a catalog has been loaded, and a failed refresh keeps serving
+# the previous one.
+PISTON_RUNTIMES_URL = os.getenv("PISTON_RUNTIMES_URL", "https://emkc.org/api/v2/piston/runtimes")
+RUNTIME_CATALOG_TTL = float(os.getenv("RUNTIME_CATALOG_TTL", 3600))
+RUNTIME_CATALOG_RETRY = float(os.getenv("RUNTIME_CATALOG_RETRY", 30))
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+router = APIRouter()
+
+_versions = {}
+_loaded_at = None
+_refresh_lock = asyncio.Lock()
+_background_refresh = None
+
+
+async def refresh_runtime_catalog():
+    global _versions, _loaded_at
+    async with _refresh_lock:
+        response = await get_client("piston").get(PISTON_RUNTIMES_URL, timeout=10)
+        response.raise_for_status()
+        runtimes = response.json()
+        # Piston lists versions oldest first; the last one per language wins.
+        versions = {runtime["language"]: runtime["version"] for runtime in runtimes}
+        for runtime in runtimes:
+            for alias in runtime.get("aliases", []):
+                versions.setdefault(alias, versions[runtime["language"]])
+        _versions, _loaded_at = versions, time.monotonic()
+        return len(versions)
+
+
+def _refresh_in_background():
+    global _background_refresh
+    if _background_refresh is None or _background_refresh.done():
+        _background_refresh = asyncio.create_task(refresh_runtime_catalog())
+        _background_refresh.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+
+async def get_runtime_version(language: str):
+    if _loaded_at is None:
+        await refresh_runtime_catalog()
+    elif time.monotonic() - _loaded_at > RUNTIME_CATALOG_TTL:
+        _refresh_in_background()  # stale-while-revalidate
+    return _versions.get(language)
+
+
+async def runtime_catalog_refresher():
+    while True:
+        try:
+            count = await refresh_runtime_catalog()
+            print(f"Runtime catalog loaded: {count} languages")
+            delay = RUNTIME_CATALOG_TTL
+        except Exception as e:
+            print(f"Runtime catalog refresh failed, keeping previous catalog: {e!r}")
+            delay = RUNTIME_CATALOG_RETRY
+        await asyncio.sleep(delay)
+
+
+@router.post("/admin/runtimes/refresh")
+async def force_runtime_refresh(x_admin_token: str = Header(None)):
+    if not ADMIN_TOKEN or x_admin_token != ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    try:
+        count = await refresh_runtime_catalog()
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Runtime refresh failed: {e}")
+    return {"languages": count}
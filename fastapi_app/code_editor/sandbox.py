@@ -0,0 +1,736 @@
+import asyncio
+import ctypes
+import fcntl
+import hashlib
+import os
+import re
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+
+# Local execution backend (CODE_EXECUTION_BACKEND=local). Each program is
+# compiled and run in its own throwaway directory as a subprocess in a new
+# session, with an empty environment and rlimits on CPU time, memory, file
+# size and open files, plus a wall-clock timeout and an output cap. At most
+# SANDBOX_WORKERS programs run at once. See "isolation" below for the user
+# and network every program (compilers included) runs with; that is what
+# keeps submissions away from the app's files and secrets, but a container
+# or VM around the whole app is still recommended.
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", os.cpu_count() or 1))
+SANDBOX_CPU_SECONDS = int(os.getenv("SANDBOX_CPU_SECONDS", 5))
+SANDBOX_WALL_SECONDS = float(os.getenv("SANDBOX_WALL_SECONDS", 10))
+SANDBOX_COMPILE_SECONDS = float(os.getenv("SANDBOX_COMPILE_SECONDS", 30))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", 256))
+SANDBOX_OUTPUT_BYTES = int(os.getenv("SANDBOX_OUTPUT_BYTES", 64 * 1024))
+SANDBOX_RUN_FILE_BYTES = SANDBOX_OUTPUT_BYTES * 16
+SANDBOX_COMPILE_FILE_BYTES = 256 * 1024 * 1024  # precompiled headers are tens of MB
+SANDBOX_PYTHON = os.getenv("SANDBOX_PYTHON", sys.executable)
+SANDBOX_CXX = os.getenv("SANDBOX_CXX", "g++")
+SANDBOX_JAVAC = os.getenv("SANDBOX_JAVAC", "javac")
+SANDBOX_JAVA = os.getenv("SANDBOX_JAVA", "java")
+# Compiled harness artifacts (C++ precompiled headers, Java Main classes),
+# keyed by content hash and shared by every submission to the same question.
+SANDBOX_HARNESS_CACHE = os.getenv("SANDBOX_HARNESS_CACHE", "true").lower() == "true"
+# The Java side of that (cached Main, warm JVMs) is off until it has been
+# run against a JDK; Java submissions get a full javac and a cold JVM.
+SANDBOX_JAVA_FAST_PATHS = os.getenv("SANDBOX_JAVA_FAST_PATHS", "false").lower() == "true"
+SANDBOX_CACHE_DIR = os.getenv("SANDBOX_CACHE_DIR", os.path.join(tempfile.gettempdir(), "sandbox-cache"))
+# Artifacts kept per kind; the least recently used go first.
+SANDBOX_CACHE_ENTRIES = int(os.getenv("SANDBOX_CACHE_ENTRIES", 200))
+# Interpreters started ahead of time per language (0 = off). Each one runs
+# a single job and is replaced, so nothing carries over between submissions.
+SANDBOX_WARM_POOL_SIZE = int(os.getenv("SANDBOX_WARM_POOL_SIZE", 0))
+
+SOURCE_NAMES = {"python": "main.py", "java": "Main.java", "c++": "main.cpp"}
+
+# --- isolation ---
+# The app runs as root and every job (one submission's compiles and run, or
+# one warm interpreter) gets a uid of its own out of the SANDBOX_UID_COUNT
+# uids starting at SANDBOX_UID, with group SANDBOX_GID and no supplementary
+# groups. A uid is held by one job at a time, across app processes too (a
+# lock file per uid), its workdir is private to it, RLIMIT_NPROC caps what
+# it can fork, and once the job is over everything still running as that uid
+# is killed: nothing a submission starts outlives it or reaches another
+# player's files. These uids must not be able to read the app's directory
+# (or .env), and need to be able to execute the SANDBOX_* interpreters and
+# compilers. With SANDBOX_NETWORK=none (the default) every program also gets
+# its own empty network namespace (no interfaces but a downed loopback).
+# Without root, programs would run as the app user and could read all of its
+# files; the backend refuses that unless SANDBOX_ALLOW_APP_USER=true (local
+# development).
+SANDBOX_UID = int(os.getenv("SANDBOX_UID")) if os.getenv("SANDBOX_UID") else None
+SANDBOX_UID_COUNT = int(os.getenv("SANDBOX_UID_COUNT", 2 * (SANDBOX_WORKERS + SANDBOX_WARM_POOL_SIZE)))
+SANDBOX_GID = int(os.getenv("SANDBOX_GID")) if os.getenv("SANDBOX_GID") else SANDBOX_UID
+SANDBOX_PROCESSES = int(os.getenv("SANDBOX_PROCESSES", 64))  # per job, threads included
+SANDBOX_ALLOW_APP_USER = os.getenv("SANDBOX_ALLOW_APP_USER", "false").lower() == "true"
+SANDBOX_NETWORK = os.getenv("SANDBOX_NETWORK", "none")
+
+CLONE_NEWUSER = 0x10000000
+CLONE_NEWNET = 0x40000000
+_libc = ctypes.CDLL(None, use_errno=True)
+_as_root = os.geteuid() == 0
+_switch_uid = _as_root and SANDBOX_UID is not None
+
+
+def _isolate(uid):
+    # Runs in the child between fork and exec.
+    if SANDBOX_NETWORK == "none":
+        # Unprivileged processes may only create a network namespace inside
+        # a new user namespace.
+        flags = CLONE_NEWNET if _as_root else CLONE_NEWUSER | CLONE_NEWNET
+        if _libc.unshare(flags) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"unshare: {os.strerror(errno)}")
+    if uid is not None:
+        os.setgroups([])
+        os.setgid(SANDBOX_GID)
+        os.setuid(uid)
+
+
+def _sandbox_dir(prefix: str, uid, dir: str = None) -> str:
+    # A fresh directory only the job's uid can use (mkdtemp makes it 0700).
+    path = tempfile.mkdtemp(prefix=prefix, dir=dir)
+    if uid is not None:
+        os.chown(path, uid, SANDBOX_GID)
+    return path
+
+
+_held_uids = {}  # uid -> its open, locked lock file
+
+
+async def _acquire_uid():
+    """Claims a sandbox uid that no other job, in this or any other app
+    process, is using. None when programs do not switch user."""
+    if not _switch_uid:
+        return None
+    lock_dir = os.path.join(SANDBOX_CACHE_DIR, "uids")
+    os.makedirs(lock_dir, mode=0o700, exist_ok=True)
+    while True:
+        for uid in range(SANDBOX_UID, SANDBOX_UID + SANDBOX_UID_COUNT):
+            if uid in _held_uids:
+                continue
+            lock = open(os.path.join(lock_dir, str(uid)), "a+")
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                continue
+            _held_uids[uid] = lock
+            if lock.tell():
+                # Its last holder died without cleaning up after its job.
+                try:
+                    await _kill_all(uid)
+                except BaseException:
+                    _held_uids.pop(uid).close()
+                    raise
+            lock.truncate(0)
+            lock.write("busy")
+            lock.flush()
+            return uid
+        # All taken, which only happens when app processes share the range.
+        await asyncio.sleep(0.05)
+
+
+async def _release_uid(uid):
+    if uid is None:
+        return
+    await _kill_all(uid)
+    lock = _held_uids.pop(uid)
+    lock.truncate(0)
+    lock.close()
+
+
+# kill(-1) from a process running as the job's uid reaches every process of
+# that uid, whatever session or process group it moved itself into. It is
+# repeated until /proc shows none left (zombies aside), in case one forked
+# while the signals went out.
+KILL_ALL_SCRIPT = (
+    "import os\n"
+    "me = str(os.getpid())\n"
+    "def alive(pid):\n"
+    "    try:\n"
+    "        return os.stat('/proc/' + pid).st_uid == os.getuid() and open('/proc/' + pid + '/stat').read().rsplit(')', 1)[1].split()[0] != 'Z'\n"
+    "    except OSError:\n"
+    "        return False\n"
+    "for _ in range(100):\n"
+    "    try:\n"
+    "        os.kill(-1, 9)\n"
+    "    except ProcessLookupError:\n"
+    "        pass\n"
+    "    if not any(pid.isdigit() and pid != me and alive(pid) for pid in os.listdir('/proc')):\n"
+    "        break\n"
+)
+
+
+async def _kill_all(uid):
+    def as_uid():
+        os.setgroups([])
+        os.setgid(SANDBOX_GID)
+        os.setuid(uid)
+
+    killer = await asyncio.create_subprocess_exec(
+        SANDBOX_PYTHON, "-I", "-S", "-c", KILL_ALL_SCRIPT,
+        env={}, stdin=asyncio.subprocess.DEVNULL, preexec_fn=as_uid,
+    )
+    await killer.wait()
+
+
+def _seal(path: str):
+    # Hands a finished build back to the app user, read-only for everyone
+    # else, so a later submission cannot tamper with a shared artifact.
+    for root, dirs, files in os.walk(path):
+        for name in [root] + [os.path.join(root, f) for f in files]:
+            mode = os.lstat(name).st_mode
+            os.lchown(name, os.geteuid(), os.getegid())
+            if not os.path.islink(name):
+                os.chmod(name, 0o755 if name == root or mode & 0o100 else 0o644)
+
+
+def check_isolation():
+    """Raises RuntimeError unless programs will run isolated as configured.
+
+    Called when the local backend is created, so a misconfigured app fails
+    at startup rather than running submissions as its own user.
+    """
+    if _as_root and SANDBOX_UID in (None, 0):
+        raise RuntimeError(
+            "refusing to run submissions as root: set SANDBOX_UID (and SANDBOX_GID) to the first of "
+            "SANDBOX_UID_COUNT unprivileged uids"
+        )
+    if _as_root and (SANDBOX_UID_COUNT < 1 or SANDBOX_GID == 0):
+        raise RuntimeError("SANDBOX_UID_COUNT must be at least 1 and SANDBOX_GID must not be 0")
+    if not _as_root and SANDBOX_UID is not None:
+        raise RuntimeError("SANDBOX_UID can only be switched to when the app runs as root")
+    if not _as_root and not SANDBOX_ALLOW_APP_USER:
+        raise RuntimeError(
+            "refusing to run submissions as the app user, who can read the app's files: run the app as "
+            "root with SANDBOX_UID set, or set SANDBOX_ALLOW_APP_USER=true for local development"
+        )
+    if SANDBOX_NETWORK not in ("none", "host"):
+        raise RuntimeError(f"SANDBOX_NETWORK must be none or host, not {SANDBOX_NETWORK!r}")
+    # The cache dir is shared by every submission: make sure it is ours
+    # (not created beforehand by someone else) and not writable by others.
+    os.makedirs(SANDBOX_CACHE_DIR, mode=0o755, exist_ok=True)
+    info = os.lstat(SANDBOX_CACHE_DIR)
+    if info.st_uid != os.geteuid() or info.st_mode & 0o022 or os.path.islink(SANDBOX_CACHE_DIR):
+        raise RuntimeError(f"{SANDBOX_CACHE_DIR} must be a directory owned by the app user and writable only by it")
+    try:
+        subprocess.run([SANDBOX_PYTHON, "-I", "-S", "-c", ""], preexec_fn=lambda: _isolate(SANDBOX_UID), env={},
+                       stdin=subprocess.DEVNULL, capture_output=True, check=True, timeout=30)
+    except (OSError, subprocess.SubprocessError) as e:
+        raise RuntimeError(
+            f"could not start an isolated {SANDBOX_PYTHON} ({e}); check SANDBOX_UID/SANDBOX_GID "
+            "can execute it, or set SANDBOX_NETWORK=host where network namespaces are unavailable"
+        )
+
+
+def _limits(uid, cpu_seconds: int, memory_mb: int = None, file_bytes: int = SANDBOX_RUN_FILE_BYTES):
+    def apply():
+        if uid is not None:
+            # Counted per uid, which is the job's own.
+            resource.setrlimit(resource.RLIMIT_NPROC, (SANDBOX_PROCESSES, SANDBOX_PROCESSES))
+        _isolate(uid)
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+        if memory_mb:
+            memory = memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (memory, memory))
+        resource.setrlimit(resource.RLIMIT_FSIZE, (file_bytes, file_bytes))
+        resource.setrlimit(resource.RLIMIT_NOFILE, (64, 64))
+        resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+    return apply
+
+
+def _kill(proc):
+    if proc.returncode is None:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+async def _read_capped(proc, stream, buffer: bytearray, limit: int):
+    # Returns True if the process had to be killed for writing too much.
+    while True:
+        chunk = await stream.read(65536)
+        if not chunk:
+            return False
+        buffer += chunk
+        if len(buffer) > limit:
+            del buffer[limit:]
+            _kill(proc)
+            return True
+
+
+async def _spawn(args, cwd, uid, cpu_seconds: int, memory_mb: int = None, file_bytes: int = SANDBOX_RUN_FILE_BYTES):
+    return await asyncio.create_subprocess_exec(
+        *args,
+        cwd=cwd,
+        env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "HOME": cwd, "LANG": "C.UTF-8"},
+        stdin=asyncio.subprocess.PIPE,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        start_new_session=True,
+        preexec_fn=_limits(uid, cpu_seconds, memory_mb, file_bytes),
+    )
+
+
+async def _collect(proc, stdin: bytes, wall_seconds: float):
+    """Feeds stdin, gathers capped output and returns a Piston-style stage dict."""
+    stdout, stderr, note = bytearray(), bytearray(), None
+    started = time.monotonic()
+    try:
+        if stdin:
+            proc.stdin.write(stdin)
+        proc.stdin.close()
+        capped = await asyncio.wait_for(
+            asyncio.gather(
+                _read_capped(proc, proc.stdout, stdout, SANDBOX_OUTPUT_BYTES),
+                _read_capped(proc, proc.stderr, stderr, SANDBOX_OUTPUT_BYTES),
+            ),
+            wall_seconds,
+        )
+        if any(capped):
+            note = "output limit exceeded"
+    except asyncio.TimeoutError:
+        note = "wall-clock limit exceeded"
+    finally:
+        _kill(proc)
+        # Drain whatever is left so the pipes reach EOF; a stream paused
+        # mid-read would otherwise keep wait() from ever returning.
+        await proc.communicate()
+    wall_ms = (time.monotonic() - started) * 1000
+
+    stdout = stdout.decode("utf-8", "replace")
+    stderr = stderr.decode("utf-8", "replace") + (f"\n{note}\n" if note else "")
+    code = proc.returncode
+    return {
+        "stdout": stdout,
+        "stderr": stderr,
+        "output": stdout + stderr,
+        "code": code if code >= 0 else None,
+        "signal": signal.Signals(-code).name if code < 0 else None,
+        "wall_time": round(wall_ms),  # ms, as Piston reports it
+    }
+
+
+async def _run(args, cwd, uid, stdin: str, wall_seconds: float, cpu_seconds: int, memory_mb: int = None,
+               file_bytes: int = SANDBOX_RUN_FILE_BYTES):
+    proc = await _spawn(args, cwd, uid, cpu_seconds, memory_mb, file_bytes)
+    return await _collect(proc, stdin.encode("utf-8") if stdin else None, wall_seconds)
+
+
+async def _compile(args, cwd, uid):
+    return await _run(
+        args, cwd, uid, None, SANDBOX_COMPILE_SECONDS, int(SANDBOX_COMPILE_SECONDS),
+        file_bytes=SANDBOX_COMPILE_FILE_BYTES,
+    )
+
+
+CXX_FLAGS = ["-O2", "-std=c++17"]
+INCLUDE_PATTERN = re.compile(r"^\s*#\s*include\s*[<\"].*$", re.MULTILINE)
+IMPORT_PATTERN = re.compile(r"^\s*import\s+[\w.*]+\s*;\s*$", re.MULTILINE)
+JAVA_LITERAL_OR_COMMENT = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|//[^\n]*|/\*.*?\*/', re.DOTALL)
+JAVA_LITERAL_OR_BRACE = re.compile(r'"(?:\\.|[^"\\\n])*"|\'(?:\\.|[^\'\\\n])*\'|[{}]')
+JAVA_METHOD_HEAD = re.compile(r"\)\s*(throws\s+[\w.<>,\s]+)?$")
+
+LINKAGE_ERRORS = re.compile(r"java\.lang\.(NoSuchMethodError|NoSuchFieldError|NoClassDefFoundError|IncompatibleClassChangeError|AbstractMethodError)")
+
+_cache_locks = defaultdict(asyncio.Lock)
+
+
+def _hash(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:32]
+
+
+async def _cached_artifact(kind: str, key: str, build, uid):
+    """Returns the cache dir for key, building it once with build(tmp_dir) as
+    the given job's uid; build returns its compile stage.
+
+    Builds go to a temporary dir that is renamed into place, so processes
+    sharing SANDBOX_CACHE_DIR never see a half-written artifact. Returns None
+    if the build failed. A compile error is remembered (a key.failed file)
+    so it is not retried for every submission; a build killed by a limit is
+    not, since it may pass when the machine is less busy.
+    """
+    target = os.path.join(SANDBOX_CACHE_DIR, kind, key)
+    failed = f"{target}.failed"
+    if os.path.isdir(target):
+        return _touch(target)
+    if os.path.exists(failed):
+        _touch(failed)
+        return None
+    async with _cache_locks[target]:
+        if os.path.isdir(target):
+            return _touch(target)
+        if os.path.exists(failed):
+            return None
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Not listable by the sandbox user, so a running submission cannot
+        # find a staging dir to write into while a build is in progress.
+        os.chmod(os.path.dirname(target), 0o711)
+        staging = _sandbox_dir(f"{key}-", uid, os.path.dirname(target))
+        try:
+            stage = await build(staging)
+            if stage["code"] != 0:
+                if stage["code"] is not None:
+                    open(failed, "w").close()
+                    _evict(os.path.dirname(target))
+                return None
+            _seal(staging)
+            try:
+                os.rename(staging, target)
+            except OSError:
+                pass  # another process got there first; theirs is identical
+            _evict(os.path.dirname(target))
+            return target
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+
+def _touch(path: str) -> str:
+    # mtime is the last use, for _evict.
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    return path
+
+
+def _evict(kind_dir: str):
+    # Keys are hex, so anything with a "-" is another build's staging dir.
+    entries = []
+    for name in os.listdir(kind_dir):
+        if "-" not in name:
+            try:
+                entries.append((os.lstat(os.path.join(kind_dir, name)).st_mtime, name))
+            except FileNotFoundError:
+                pass
+    entries.sort()
+    for _, name in entries[:max(len(entries) - SANDBOX_CACHE_ENTRIES, 0)]:
+        path = os.path.join(kind_dir, name)
+        try:
+            if name.endswith(".failed"):
+                os.remove(path)
+            else:
+                shutil.rmtree(path)
+        except FileNotFoundError:
+            pass  # evicted by another process
+
+
+async def _cxx_pch(main: str, uid):
+    # Precompiled header for the #include lines of the question's harness
+    # main, never the player's code, so submissions cannot mint new cache
+    # entries. "using" lines stay out: they would precede the user's code and
+    # change name lookup in it.
+    includes = "\n".join(sorted(set(INCLUDE_PATTERN.findall(main))))
+    if not includes:
+        return None
+
+    async def build(staging):
+        with open(os.path.join(staging, "harness.h"), "w") as f:
+            f.write(includes + "\n")
+        stage = await _compile([SANDBOX_CXX, *CXX_FLAGS, "-x", "c++-header", "harness.h", "-o", "harness.h.gch"], staging, uid)
+        return stage
+
+    pch_dir = await _cached_artifact("cxx-pch", _hash(SANDBOX_CXX, *CXX_FLAGS, includes), build, uid)
+    return os.path.join(pch_dir, "harness.h") if pch_dir else None
+
+
+async def _java_harness(main: str, skeleton: str, uid):
+    # Main (and anything else declared in the harness file) compiled once per
+    # question, against the signatures of the question's Solution skeleton
+    # rather than any one player's code: Java picks overloads at compile
+    # time, so every submission must see the same bindings. -implicit:none
+    # keeps the stub Solution out of the cache.
+    stub = _java_signature_stub(skeleton)
+
+    async def build(staging):
+        with open(os.path.join(staging, "Main.java"), "w") as f:
+            f.write(main)
+        with open(os.path.join(staging, "Solution.java"), "w") as f:
+            f.write(_java_solution_source(main, stub))
+        stage = await _compile([SANDBOX_JAVAC, "-J-Xmx512m", "-implicit:none", "-sourcepath", ".", "Main.java"], staging, uid)
+        os.remove(os.path.join(staging, "Main.java"))
+        os.remove(os.path.join(staging, "Solution.java"))
+        return stage
+
+    return await _cached_artifact("java-harness", _hash(SANDBOX_JAVAC, main, stub), build, uid)
+
+
+def _java_signature_stub(skeleton: str) -> str:
+    """The skeleton with every method and constructor body replaced by a
+    throw, so it compiles whatever the bodies held ("// your code here" in a
+    method that must return a value does not)."""
+    source = JAVA_LITERAL_OR_COMMENT.sub(lambda m: m.group(0) if m.group(0)[0] in "\"'" else " ", skeleton)
+    parts, last, depth, body = [], 0, 0, None
+    for m in JAVA_LITERAL_OR_BRACE.finditer(source):
+        if m.group(0) == "{":
+            if body is None and depth > 0 and JAVA_METHOD_HEAD.search(source, 0, m.start()):
+                parts.append(source[last:m.end()])
+                body = depth
+            depth += 1
+        elif m.group(0) == "}":
+            depth -= 1
+            if body is not None and depth == body:
+                parts.append(" throw new UnsupportedOperationException(); ")
+                last = m.start()
+                body = None
+    parts.append(source[last:])
+    return "".join(parts)
+
+
+def _java_solution_source(main: str, code: str) -> str:
+    # The prompts put every import in Main; the user's file needs them too.
+    return "\n".join(IMPORT_PATTERN.findall(main)) + "\n" + code
+
+
+def _run_args(language: str, source_name: str, classpath: str = "."):
+    if language == "python":
+        return [SANDBOX_PYTHON, "-I", "-S", source_name]
+    if language == "c++":
+        return ["./main"]
+    # The JVM reserves far more address space than it uses, so memory is
+    # capped with -Xmx rather than RLIMIT_AS.
+    return [SANDBOX_JAVA, f"-Xmx{SANDBOX_MEMORY_MB}m", "-XX:+UseSerialGC", "-cp", classpath, "Main"]
+
+
+async def _compile_cxx(workdir: str, harness, source_name: str, uid):
+    pch = await _cxx_pch(harness["main"], uid) if SANDBOX_HARNESS_CACHE and harness else None
+    if pch:
+        stage = await _compile([SANDBOX_CXX, *CXX_FLAGS, "-include", pch, "-o", "main", source_name], workdir, uid)
+        if stage["code"] == 0:
+            return stage
+    # No header, or something the PCH changed: compile exactly as written so
+    # errors match what the player wrote.
+    return await _compile([SANDBOX_CXX, *CXX_FLAGS, "-o", "main", source_name], workdir, uid)
+
+
+async def _compile_java(workdir: str, harness, uid):
+    """Compiles just the user's code against a cached harness.
+
+    Returns (compile stage, classpath), or None when the split build does not
+    apply or fails, in which case the caller compiles the whole program.
+    """
+    if not (SANDBOX_HARNESS_CACHE and SANDBOX_JAVA_FAST_PATHS and harness and harness.get("skeleton")):
+        return None
+    harness_dir = await _java_harness(harness["main"], harness["skeleton"], uid)
+    if not harness_dir:
+        return None
+    with open(os.path.join(workdir, "Solution.java"), "w") as f:
+        f.write(_java_solution_source(harness["main"], harness["code"]))
+    stage = await _compile([SANDBOX_JAVAC, "-J-Xmx512m", "-cp", harness_dir, "Solution.java"], workdir, uid)
+    if stage["code"] != 0:
+        return None
+    return stage, f"{harness_dir}{os.pathsep}."
+
+
+# --- warm interpreters ---
+PYTHON_LOADER = (
+    "import io, sys\n"
+    "data = sys.stdin.buffer.read()\n"
+    "size, _, rest = data.partition(b'\\n')\n"
+    "sys.stdin = io.TextIOWrapper(io.BytesIO(rest[int(size):]))\n"
+    "exec(compile(rest[:int(size)], 'main.py', 'exec'), {'__name__': '__main__', '__builtins__': __builtins__})\n"
+)
+JAVA_LOADER = (
+    "import java.io.*; import java.net.*;\n"
+    "public class Loader {\n"
+    "    public static void main(String[] args) throws Exception {\n"
+    "        // Byte by byte, straight off System.in: a Reader would buffer\n"
+    "        // past the newline and swallow the program's own input.\n"
+    "        ByteArrayOutputStream line = new ByteArrayOutputStream();\n"
+    "        for (int c; (c = System.in.read()) != -1 && c != '\\n'; ) line.write(c);\n"
+    "        String[] paths = line.toString(\"UTF-8\").split(File.pathSeparator);\n"
+    "        URL[] urls = new URL[paths.length];\n"
+    "        for (int i = 0; i < paths.length; i++) urls[i] = new File(paths[i]).toURI().toURL();\n"
+    "        Class<?> main = new URLClassLoader(urls, ClassLoader.getPlatformClassLoader()).loadClass(\"Main\");\n"
+    "        try {\n"
+    "            main.getMethod(\"main\", String[].class).invoke(null, (Object) new String[0]);\n"
+    "        } catch (java.lang.reflect.InvocationTargetException e) {\n"
+    "            e.getCause().printStackTrace();\n"
+    "            System.exit(1);\n"
+    "        }\n"
+    "        System.out.flush();\n"
+    "    }\n"
+    "}\n"
+)
+
+
+class WarmPool:
+    """Processes already past interpreter/JVM startup, waiting on stdin for
+    a job. take() hands one out, or None if none is ready; refill() tops the
+    pool back up in the background once the job is done, so the replacement
+    does not compete with it for CPU."""
+
+    def __init__(self, size: int, spawn):
+        self.size = size
+        self._spawn = spawn
+        self._ready = []
+        self._filling = set()
+
+    def refill(self):
+        while len(self._ready) + len(self._filling) < self.size:
+            task = asyncio.create_task(self._spawn())
+            self._filling.add(task)
+            task.add_done_callback(self._spawned)
+
+    def _spawned(self, task):
+        self._filling.discard(task)
+        if not task.cancelled() and task.exception() is None:
+            self._ready.append(task.result())
+
+    async def close(self):
+        self.size = 0
+        for task in list(self._filling):
+            task.cancel()
+        while self._ready:
+            await _retire(*self._ready.pop())
+
+    async def take(self):
+        while self._ready:
+            warm = self._ready.pop()
+            if warm[0].returncode is None:
+                return warm
+            await _retire(*warm)
+        self.refill()
+        return None
+
+
+async def _retire(proc, workdir, uid):
+    # Done with a warm process: kill it and anything it started, then free
+    # its uid.
+    _kill(proc)
+    await proc.communicate()
+    await _release_uid(uid)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+async def _java_loader_dir(uid):
+    async def build(staging):
+        with open(os.path.join(staging, "Loader.java"), "w") as f:
+            f.write(JAVA_LOADER)
+        stage = await _compile([SANDBOX_JAVAC, "Loader.java"], staging, uid)
+        os.remove(os.path.join(staging, "Loader.java"))
+        return stage
+
+    return await _cached_artifact("java-loader", _hash(SANDBOX_JAVAC, JAVA_LOADER), build, uid)
+
+
+async def _spawn_warm(language: str):
+    # Each warm process holds a uid of its own from now until its job is done.
+    uid = await _acquire_uid()
+    workdir = _sandbox_dir("sandbox-warm-", uid)
+    try:
+        if language == "python":
+            args, memory_mb = [SANDBOX_PYTHON, "-I", "-S", "-c", PYTHON_LOADER], SANDBOX_MEMORY_MB
+        else:
+            loader_dir = await _java_loader_dir(uid)
+            if not loader_dir:
+                raise RuntimeError("could not compile the Java loader")
+            args, memory_mb = [SANDBOX_JAVA, f"-Xmx{SANDBOX_MEMORY_MB}m", "-XX:+UseSerialGC", "-cp", loader_dir, "Loader"], None
+        return await _spawn(args, workdir, uid, SANDBOX_CPU_SECONDS, memory_mb), workdir, uid
+    except BaseException:
+        await _release_uid(uid)
+        shutil.rmtree(workdir, ignore_errors=True)
+        raise
+
+
+warm_pools = {
+    "python": WarmPool(SANDBOX_WARM_POOL_SIZE, lambda: _spawn_warm("python")),
+    "java": WarmPool(SANDBOX_WARM_POOL_SIZE, lambda: _spawn_warm("java")),
+}
+
+
+async def close_warm_pools():
+    for pool in warm_pools.values():
+        await pool.close()
+
+
+async def _run_warm(language: str, workdir: str, source: str, stdin: str, classpath: str):
+    if language == "java" and not SANDBOX_JAVA_FAST_PATHS:
+        return None
+    pool = warm_pools[language]
+    warm = await pool.take() if SANDBOX_WARM_POOL_SIZE else None
+    if not warm:
+        return None
+    proc, warm_dir, warm_uid = warm
+    try:
+        if language == "python":
+            job = str(len(source.encode("utf-8"))).encode() + b"\n" + source.encode("utf-8") + (stdin or "").encode("utf-8")
+        else:
+            # The job's workdir is private to the job's uid: hand the warm
+            # JVM its own copy of the compiled classes.
+            for name in os.listdir(workdir):
+                if name.endswith(".class"):
+                    shutil.copy(os.path.join(workdir, name), warm_dir)
+                    if warm_uid is not None:
+                        os.chown(os.path.join(warm_dir, name), warm_uid, SANDBOX_GID)
+            classpath = os.pathsep.join(os.path.join(warm_dir, p) if p == "." else p for p in classpath.split(os.pathsep))
+            job = classpath.encode("utf-8") + b"\n" + (stdin or "").encode("utf-8")
+        return await _collect(proc, job, SANDBOX_WALL_SECONDS)
+    finally:
+        await _retire(proc, warm_dir, warm_uid)
+        pool.refill()
+
+
+async def _execute(language: str, workdir: str, uid, source: str, source_name: str, stdin: str, classpath: str):
+    if language in warm_pools:
+        warm = await _run_warm(language, workdir, source, stdin, classpath)
+        if warm:
+            return warm
+    return await _run(
+        _run_args(language, source_name, classpath), workdir, uid, stdin,
+        SANDBOX_WALL_SECONDS, SANDBOX_CPU_SECONDS,
+        None if language == "java" else SANDBOX_MEMORY_MB,
+    )
+
+
+_workers = asyncio.Semaphore(SANDBOX_WORKERS)
+
+
+async def run(payload):
+    language = payload["language"]
+    source_name = SOURCE_NAMES[language]
+    source = payload["files"][0]["content"]
+    harness = payload.get("harness")  # {"main", "code", "skeleton"} when the caller knows the split
+    stdin = payload.get("stdin")
+
+    response = {"language": language, "version": payload.get("version") or "local"}
+    async with _workers:
+        uid = await _acquire_uid()
+        workdir = _sandbox_dir("sandbox-", uid)
+        try:
+            with open(os.path.join(workdir, source_name), "w") as f:
+                f.write(source)
+            classpath = "."
+            if language == "c++":
+                response["compile"] = await _compile_cxx(workdir, harness, source_name, uid)
+            elif language == "java":
+                split = await _compile_java(workdir, harness, uid)
+                if split:
+                    response["compile"], classpath = split
+                else:
+                    response["compile"] = await _compile([SANDBOX_JAVAC, "-J-Xmx512m", source_name], workdir, uid)
+            if "compile" in response and response["compile"]["code"] != 0:
+                return response  # Piston omits "run" when compilation fails
+
+            response["run"] = await _execute(language, workdir, uid, source, source_name, stdin, classpath)
+            if classpath != "." and LINKAGE_ERRORS.search(response["run"]["stderr"]):
+                # This Solution does not have the skeleton's signatures, which
+                # the cached Main was compiled against; build it the slow way.
+                response["compile"] = await _compile([SANDBOX_JAVAC, "-J-Xmx512m", source_name], workdir, uid)
+                if response["compile"]["code"] != 0:
+                    del response["run"]
+                    return response
+                response["run"] = await _execute(language, workdir, uid, source, source_name, stdin, ".")
+            return response
+        finally:
+            # Killing first, so nothing the job left running can write into
+            # its dir while it is being removed.
+            await _release_uid(uid)
+            shutil.rmtree(workdir, ignore_errors=True)
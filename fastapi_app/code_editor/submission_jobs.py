@@ -0,0 +1,226 @@
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi_app import metrics
+from fastapi_app.code_editor.code_submission import SubmitCodeRequest, grade_submission
+from fastapi_app.queue.redis_connection import REDIS_SOCKET_TIMEOUT, async_redis_client
+
+# Submissions as jobs: POST returns a job_id at once, graders in any process
+# pull jobs from a Redis stream through one consumer group, and the verdict
+# is stored on the job and published so SSE waiters in every process wake up.
+JOBS_STREAM = "submissions:jobs"
+GRADERS_GROUP = "graders"
+VERDICT_CHANNEL = "submissions:verdicts"
+GRADER_CONCURRENCY = int(os.getenv("GRADER_CONCURRENCY", 4))
+MAX_QUEUE_DEPTH = int(os.getenv("SUBMISSION_MAX_QUEUE_DEPTH", 1000))
+MAX_PENDING_PER_USER = int(os.getenv("SUBMISSION_MAX_PENDING_PER_USER", 2))
+JOB_TTL = int(os.getenv("SUBMISSION_JOB_TTL", 3600))
+# A job held this long by a grader that stopped acking it is taken over.
+CLAIM_IDLE_MS = int(os.getenv("SUBMISSION_CLAIM_IDLE_MS", 120_000))
+READ_BLOCK_MS = int(REDIS_SOCKET_TIMEOUT / 2 * 1000)
+GRADER_ID = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+router = APIRouter()
+verdict_waiters = {}  # job_id -> asyncio.Event, for SSE clients in this process
+
+
+def get_job_key(job_id: str) -> str:
+    return f"submission_job:{job_id}"
+
+
+def get_pending_key(user_id: str) -> str:
+    return f"submissions:pending:{user_id}"
+
+
+async def enqueue_submission(payload: SubmitCodeRequest) -> str:
+    # Backpressure: refuse new work instead of letting the backlog grow
+    # without bound. Fairness: each user holds at most MAX_PENDING_PER_USER
+    # places in the FIFO, so one user's burst cannot starve the others.
+    depth = await async_redis_client.xlen(JOBS_STREAM)
+    metrics.set_gauge("submission_queue_depth", depth)
+    if depth >= MAX_QUEUE_DEPTH:
+        raise HTTPException(status_code=503, detail="Grading queue is full, try again shortly.", headers={"Retry-After": "5"})
+
+    pending_key = get_pending_key(payload.user_id)
+    pending = await async_redis_client.incr(pending_key)
+    await async_redis_client.expire(pending_key, JOB_TTL)
+    if pending > MAX_PENDING_PER_USER:
+        await async_redis_client.decr(pending_key)
+        raise HTTPException(status_code=429, detail="Too many submissions being graded, wait for a verdict.")
+
+    job_id = uuid.uuid4().hex
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(get_job_key(job_id), mapping={
+            "status": "queued",
+            "user_id": payload.user_id,
+            "enqueued_at": time.time(),
+        })
+        pipe.expire(get_job_key(job_id), JOB_TTL)
+        pipe.xadd(JOBS_STREAM, {"job_id": job_id, "payload": payload.model_dump_json()})
+        await pipe.execute()
+    metrics.increment("submissions_enqueued")
+    return job_id
+
+
+async def get_job(job_id: str):
+    job = await async_redis_client.hgetall(get_job_key(job_id))
+    if not job:
+        return None
+    job = {k.decode(): v.decode() for k, v in job.items()}
+    if "result" in job:
+        job["result"] = json.loads(job["result"])
+    return {"job_id": job_id, **job}
+
+
+async def finish_job(job_id: str, user_id: str, status: str, result):
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        pipe.hset(get_job_key(job_id), mapping={
+            "status": status,
+            "result": json.dumps(result),
+            "finished_at": time.time(),
+        })
+        pipe.decr(get_pending_key(user_id))
+        pipe.publish(VERDICT_CHANNEL, job_id)
+        await pipe.execute()
+
+
+async def grade_job(message_id, fields):
+    job_id = fields[b"job_id"].decode()
+    payload = SubmitCodeRequest.model_validate_json(fields[b"payload"])
+    job_key = get_job_key(job_id)
+    enqueued_at = float(await async_redis_client.hget(job_key, "enqueued_at") or time.time())
+    metrics.observe("submission_queue_wait_ms", (time.time() - enqueued_at) * 1000)
+    await async_redis_client.hset(job_key, "status", "running")
+
+    started = time.perf_counter()
+    try:
+        await finish_job(job_id, payload.user_id, "done", await grade_submission(payload))
+    except HTTPException as e:
+        await finish_job(job_id, payload.user_id, "failed", {"status_code": e.status_code, "detail": e.detail})
+    except Exception as e:
+        logging.error(f"Grading job {job_id} failed: {e!r}")
+        await finish_job(job_id, payload.user_id, "failed", {"status_code": 500, "detail": str(e)})
+    metrics.observe("grading_ms", (time.perf_counter() - started) * 1000)
+    metrics.increment("submissions_graded")
+    await async_redis_client.xack(JOBS_STREAM, GRADERS_GROUP, message_id)
+    await async_redis_client.xdel(JOBS_STREAM, message_id)
+
+
+async def ensure_graders_group():
+    try:
+        await async_redis_client.xgroup_create(JOBS_STREAM, GRADERS_GROUP, id="0", mkstream=True)
+    except Exception as e:
+        if "BUSYGROUP" not in str(e):
+            raise
+
+
+async def grader(consumer: str):
+    while True:
+        try:
+            # Jobs abandoned by a grader that died go first.
+            # Redis 7 replies [cursor, entries, deleted ids], 6.2 [cursor, entries].
+            claimed = (await async_redis_client.xautoclaim(
+                JOBS_STREAM, GRADERS_GROUP, consumer, CLAIM_IDLE_MS, count=1
+            ))[1]
+            if not claimed:
+                response = await async_redis_client.xreadgroup(
+                    GRADERS_GROUP, consumer, {JOBS_STREAM: ">"}, count=1, block=READ_BLOCK_MS
+                )
+                claimed = response[0][1] if response else []
+            for message_id, fields in claimed:
+                if fields:  # entries deleted while pending come back empty
+                    await grade_job(message_id, fields)
+                else:
+                    await async_redis_client.xack(JOBS_STREAM, GRADERS_GROUP, message_id)
+            metrics.set_gauge("submission_queue_depth", await async_redis_client.xlen(JOBS_STREAM))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Grader {consumer} failed: {e!r}")
+            await asyncio.sleep(1)
+
+
+async def grader_pool(concurrency: int = GRADER_CONCURRENCY):
+    await ensure_graders_group()
+    await asyncio.gather(*(grader(f"{GRADER_ID}:{i}") for i in range(concurrency)))
+
+
+async def verdict_listener():
+    # Same shape as match_notification_listener: one subscription per process
+    # fanned out to the local SSE waiters.
+    while True:
+        pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(VERDICT_CHANNEL)
+            while True:
+                message = await pubsub.get_message(timeout=REDIS_SOCKET_TIMEOUT / 2)
+                if message is None:
+                    continue
+                event = verdict_waiters.get(message["data"].decode())
+                if event:
+                    event.set()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Verdict listener failed, resubscribing: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
+@router.post("/submission-jobs", status_code=202)
+async def submit_code_job(payload: SubmitCodeRequest):
+    job_id = await enqueue_submission(payload)
+    return {"job_id": job_id, "status": "queued"}
+
+
+@router.get("/submission-jobs/{job_id}")
+async def get_submission_job(job_id: str):
+    job = await get_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JSONResponse(content=job)
+
+
+@router.get("/submission-jobs/{job_id}/events")
+async def stream_submission_verdict(job_id: str):
+    event = verdict_waiters.setdefault(job_id, asyncio.Event())
+
+    async def event_generator():
+        try:
+            while True:
+                job = await get_job(job_id)
+                if not job:
+                    yield f"data: {json.dumps({'job_id': job_id, 'status': 'unknown'})}\n\n"
+                    return
+                if job["status"] in ("done", "failed"):
+                    yield f"data: {json.dumps(job)}\n\n"
+                    return
+                # Re-check now and then in case a publish was missed.
+                try:
+                    await asyncio.wait_for(event.wait(), REDIS_SOCKET_TIMEOUT)
+                except asyncio.TimeoutError:
+                    pass
+                event.clear()
+        finally:
+            verdict_waiters.pop(job_id, None)
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+
+async def main():
+    try:
+        await grader_pool()
+    finally:
+        await async_redis_client.aclose()
+
+
+# Standalone graders: python -m fastapi_app.code_editor.submission_jobs
+# Run as many as needed and set SUBMISSION_GRADERS_IN_PROCESS=false on the API.
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+import hashlib
+import json
+import os
+import time
+from fastapi_app import metrics
+from fastapi_app.code_editor import execution
+from fastapi_app.queue.redis_connection import async_redis_client
+from fastapi_app.questiongenerator.question_store import content_hash
+from fastapi_app.singleflight import SingleFlight
+
+# Execution results for (question, language, normalised code), shared across
+# processes, so an identical resubmission is answered from Redis without
+# running anything. Entries expire after VERDICT_CACHE_TTL and, past
+# VERDICT_CACHE_MAX_ENTRIES, the least recently used ones are evicted using a
+# last-access ZSET.
+VERDICT_CACHE_TTL = int(os.getenv("VERDICT_CACHE_TTL", 3600))
+VERDICT_CACHE_MAX_ENTRIES = int(os.getenv("VERDICT_CACHE_MAX_ENTRIES", 50_000))
+VERDICT_LRU_KEY = "verdict_cache:lru"
+
+STORE_SCRIPT = """
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+redis.call('ZADD', KEYS[2], ARGV[3], KEYS[1])
+local overflow = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if overflow > 0 then
+    local evicted = redis.call('ZPOPMIN', KEYS[2], overflow)
+    for i = 1, #evicted, 2 do
+        redis.call('DEL', evicted[i])
+    end
+end
+"""
+_store = async_redis_client.register_script(STORE_SCRIPT)
+
+# Identical submissions arriving together run once.
+execution_flight = SingleFlight("submission_execution", lock_ttl_ms=60_000)
+
+
+def normalize_code(code: str) -> str:
+    # Only changes that cannot alter behaviour in any of the languages:
+    # line endings, trailing whitespace and leading/trailing blank lines.
+    # Indentation is significant in Python and stays as it is.
+    lines = code.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).strip("\n")
+
+
+def get_verdict_key(question, language: str, code: str) -> str:
+    question_hash = question.get("content_hash") or content_hash(question)
+    code_hash = hashlib.sha256(normalize_code(code).encode("utf-8")).hexdigest()
+    return f"verdict:{execution.backend.name}:{question_hash}:{language}:{code_hash}"
+
+
+def is_cacheable(result) -> bool:
+    # Killed runs (timeouts, limits) may pass on a less loaded executor.
+    return not (result.get("run") or {}).get("signal")
+
+
+async def get_cached_result(key: str):
+    async with async_redis_client.pipeline(transaction=False) as pipe:
+        pipe.get(key)
+        pipe.zadd(VERDICT_LRU_KEY, {key: time.time()}, xx=True)
+        cached, _ = await pipe.execute()
+    return json.loads(cached) if cached else None
+
+
+async def execute_cached(question, language: str, code: str, full_code: str, harness=None):
+    key = get_verdict_key(question, language, code)
+    cached = await get_cached_result(key)
+    if cached is not None:
+        metrics.increment("verdict_cache_hits")
+        return cached
+    metrics.increment("verdict_cache_misses")
+
+    async def run():
+        result = await execution.execute(language, full_code, harness=harness)
+        if is_cacheable(result):
+            await _store(
+                keys=[key, VERDICT_LRU_KEY],
+                args=[json.dumps(result), VERDICT_CACHE_TTL, time.time(), VERDICT_CACHE_MAX_ENTRIES],
+            )
+        return result
+
+    return await execution_flight.run(key, run)
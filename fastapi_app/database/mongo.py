@@ -7,3 +7,9 @@ load_dotenv()
 MONGO_URL =os.getenv('MONGO_URL')
 client = AsyncIOMotorClient(MONGO_URL)
 db = client["tech_cafe"]
+
+
+async def ensure_indexes():
+    # Serves "is this user in an active room" lookups and the matcher's
+    # room_users reconciliation.
+    await db.rooms.create_index([("users.user_id", 1), ("status", 1)])
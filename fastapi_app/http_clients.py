@@ -0,0 +1,57 @@
+import os
+import httpx
+
+# One pooled AsyncClient per upstream, created in the app lifespan and closed
+# on shutdown, so outbound calls reuse keep-alive connections instead of
+# paying a TCP+TLS handshake each time. Code that runs outside the app (the
+# standalone matcher, benchmarks) gets clients created lazily on first use.
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", 100))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", 20))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", 30))
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", 5))
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", 30))
+HTTP_POOL_TIMEOUT = float(os.getenv("HTTP_POOL_TIMEOUT", 10))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "false").lower() == "true"
+
+UPSTREAMS = ["piston", "github", "default"]
+
+_clients = {}
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401  (httpx[http2])
+        return True
+    except ImportError:
+        print("HTTP2_ENABLED is set but the h2 package is missing; using HTTP/1.1")
+        return False
+
+
+def create_client() -> httpx.AsyncClient:
+    return httpx.AsyncClient(
+        http2=HTTP2_ENABLED and _http2_available(),
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, pool=HTTP_POOL_TIMEOUT),
+    )
+
+
+def open_clients():
+    for name in UPSTREAMS:
+        get_client(name)
+
+
+def get_client(upstream: str = "default") -> httpx.AsyncClient:
+    client = _clients.get(upstream)
+    if client is None or client.is_closed:
+        client = _clients[upstream] = create_client()
+    return client
+
+
+async def close_clients():
+    for client in _clients.values():
+        await client.aclose()
+    _clients.clear()
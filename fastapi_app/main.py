@@ -7,7 +7,6 @@ from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 import asyncio
-import httpx
 import os
 from dotenv import load_dotenv
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
@@ -24,15 +23,46 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 20160))
 FRONTEND_URL = os.getenv("FRONTEND_URL", "https://code-cafe-frontend.netlify.app")
 GITHUB_REDIRECT_URI = os.getenv("GITHUB_REDIRECT_URI")
-PISTON_URL = "https://emkc.org/api/v2/piston/execute"
 
 # --- Lifespan ---
 from fastapi_app.queue.matchmaking_worker import matchmaking_loop
+from fastapi_app.queue.redis_connection import async_redis_client
+from fastapi_app.queue.router import match_notification_listener
+from fastapi_app.questiongenerator.question_bank import question_bank_replenisher
+from fastapi_app.code_editor.runtimes import runtime_catalog_refresher
+from fastapi_app.http_clients import close_clients, get_client, open_clients
+from fastapi_app.code_editor import execution
+from fastapi_app.code_editor.submission_jobs import grader_pool, verdict_listener
+
+MATCHMAKER_IN_PROCESS = os.getenv("MATCHMAKER_IN_PROCESS", "true").lower() == "true"
+QUESTION_BANK_REPLENISHER = os.getenv("QUESTION_BANK_REPLENISHER", "true").lower() == "true"
+SUBMISSION_GRADERS_IN_PROCESS = os.getenv("SUBMISSION_GRADERS_IN_PROCESS", "true").lower() == "true"
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    asyncio.create_task(matchmaking_loop())
+    open_clients()
+    matchmaker = asyncio.create_task(matchmaking_loop()) if MATCHMAKER_IN_PROCESS else None
+    match_listener = asyncio.create_task(match_notification_listener())
+    replenisher = asyncio.create_task(question_bank_replenisher()) if QUESTION_BANK_REPLENISHER else None
+    runtime_refresher = (
+        asyncio.create_task(runtime_catalog_refresher()) if execution.CODE_EXECUTION_BACKEND == "piston" else None
+    )
+    graders = asyncio.create_task(grader_pool()) if SUBMISSION_GRADERS_IN_PROCESS else None
+    verdicts = asyncio.create_task(verdict_listener())
     yield
+    verdicts.cancel()
+    if graders:
+        graders.cancel()
+    if runtime_refresher:
+        runtime_refresher.cancel()
+    match_listener.cancel()
+    if replenisher:
+        replenisher.cancel()
+    if matchmaker:
+        matchmaker.cancel()
+    await async_redis_client.aclose()
+    await close_clients()
+    await execution.close_backend()
 
 # --- App Initialization ---
 app = FastAPI(lifespan=lifespan)
@@ -81,12 +111,15 @@ async def get_current_user(request: Request) -> Optional[User]:
         return None
 
 # --- Routers ---
+from fastapi_app import metrics
 from fastapi_app.questiongenerator.questions import router as questions_router
 from fastapi_app.code_editor.router import router as editor_router
 from fastapi_app.domain.router import router as domain_router
 from fastapi_app.matchmaking.router import router as matchmaking_router
 from fastapi_app.queue.router import router as queue_router
 from fastapi_app.code_editor.code_submission import router as code_submission_router
+from fastapi_app.code_editor.runtimes import router as runtimes_router
+from fastapi_app.code_editor.submission_jobs import router as submission_jobs_router
 
 app.include_router(editor_router)
 app.include_router(domain_router, prefix="/api")
@@ -94,21 +127,25 @@ app.include_router(matchmaking_router, prefix="/api/matchmaking")
 app.include_router(queue_router, prefix="/api")
 app.include_router(questions_router, prefix="/api/questions")
 app.include_router(code_submission_router, prefix="/api/questions")
+app.include_router(runtimes_router, prefix="/api")
+app.include_router(submission_jobs_router, prefix="/api/questions")
 
 # --- Basic Routes ---
 @app.get("/")
 def root():
     return {"msg": "Backend running"}
 
+@app.get("/metrics")
+def get_metrics():
+    return metrics.snapshot()
+
 @app.post("/run-code")
 async def run_code(request: Request):
     payload = await request.json()
-    async with httpx.AsyncClient() as client:
-        try:
-            response = await client.post(PISTON_URL, json=payload)
-            return response.json()
-        except Exception as e:
-            return {"error": str(e)}
+    try:
+        return await execution.run_code(payload)
+    except Exception as e:
+        return {"error": str(e)}
 
 # --- GitHub OAuth ---
 @app.get("/auth/github/login")
@@ -139,18 +176,18 @@ async def exchange_github_code_for_token(payload: dict):
         "redirect_uri": GITHUB_REDIRECT_URI
     }
 
-    async with httpx.AsyncClient() as client:
-        token_response = await client.post(token_url, json=payload, headers=headers)
-        token_data = token_response.json()
+    client = get_client("github")
+    token_response = await client.post(token_url, json=payload, headers=headers)
+    token_data = token_response.json()
 
-        access_token = token_data.get("access_token")
-        if not access_token:
-            raise HTTPException(status_code=400, detail="GitHub access token not received")
+    access_token = token_data.get("access_token")
+    if not access_token:
+        raise HTTPException(status_code=400, detail="GitHub access token not received")
 
-        user_headers = {"Authorization": f"token {access_token}"}
-        user_response = await client.get("https://api.github.com/user", headers=user_headers)
-        user_data = user_response.json()
-        print(user_data)
+    user_headers = {"Authorization": f"token {access_token}"}
+    user_response = await client.get("https://api.github.com/user", headers=user_headers)
+    user_data = user_response.json()
+    print(user_data)
     github_login = user_data.get("login")
     github_id = str(user_data.get("id"))
     session_data = {
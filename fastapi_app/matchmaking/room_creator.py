@@ -2,15 +2,16 @@ import json
 import time
 import asyncio
 from fastapi_app.database.mongo import db
-from fastapi_app.queue.queue import dequeue_users, get_queue_key, redis_client
+from fastapi_app.queue.queue import dequeue_users, get_queue_key
+from fastapi_app.queue.redis_connection import async_redis_client
 
 
 async def matchmaker(domain: str, room_type: str):
     queue_key = get_queue_key(domain, room_type)
     while True:
-        queue_length = redis_client.llen(queue_key)
+        queue_length = await async_redis_client.zcard(queue_key)
         if queue_length >= 4:
-            users = dequeue_users(domain, room_type, 4)
+            users = await dequeue_users(domain, room_type, 4)
             user_ids = [u["user_id"] for u in users]
             await db.rooms.insert_one({
                 "domain": domain,
@@ -9,11 +9,13 @@ from fastapi_app.queue.queue import enqueue_user, dequeue_users, get_queue_lengt
 router = APIRouter()
 
 @router.post("/join-queue")
-def join_queue(payload:dict):
+async def join_queue(payload:dict):
     print("Inside Join Queue")
     domain=payload.get("domain")
     user_id=payload.get("user_id")
-    if not enqueue_user(domain, user_id): 
+    room_type=payload.get("room_type")
+    rating=payload.get("rating")
+    if not await enqueue_user(domain, user_id, room_type, rating): 
         raise HTTPException(status_code=400, detail="User already in queue")
     return {"message": f"User {user_id} added to queue for domain {domain}"}
 
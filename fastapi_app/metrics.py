@@ -0,0 +1,39 @@
+from collections import defaultdict, deque
+
+# Process-local counters and latency samples, exposed as JSON on /metrics.
+# Each API or worker process reports its own numbers; sum across processes
+# when scraping.
+counters = defaultdict(int)
+samples = defaultdict(lambda: deque(maxlen=1000))
+gauges = {}
+
+
+def increment(name: str, amount: int = 1):
+    counters[name] += amount
+
+
+def observe(name: str, value: float):
+    samples[name].append(value)
+
+
+def set_gauge(name: str, value: float):
+    gauges[name] = value
+
+
+def summarize(values):
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+
+    def percentile(p):
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))]
+
+    return {"count": len(ordered), "p50": percentile(50), "p90": percentile(90), "p99": percentile(99)}
+
+
+def snapshot():
+    return {
+        "counters": dict(counters),
+        "gauges": dict(gauges),
+        "latencies": {name: summarize(values) for name, values in samples.items()},
+    }
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+import random
+import uuid
+
+# Local stand-in for Gemini (LLM_BACKEND=fake): answers the question prompts
+# with small, valid questions after a configurable delay, and fails a
+# configurable fraction of calls the way an overloaded provider would.
+FAKE_LLM_LATENCY = float(os.getenv("FAKE_LLM_LATENCY", 0.5))
+FAKE_LLM_FAILURE_RATE = float(os.getenv("FAKE_LLM_FAILURE_RATE", 0))
+
+
+class FakeProviderError(Exception):
+    def __init__(self, code: int):
+        super().__init__(f"fake provider error {code}")
+        self.code = code
+
+
+def fake_question(debugging: bool):
+    k = random.randint(2, 9)
+    # Random filler keeps fake questions from being near duplicates of each other.
+    filler = " ".join(uuid.uuid4().hex[:6] for _ in range(12))
+    solution = {
+        "python": f"def solve(n):\n    return n * {k}\n",
+        "java": f"class Solution {{\n    int solve(int n) {{\n        return n * {k};\n    }}\n}}\n",
+        "c++": f"int solve(int n) {{\n    return n * {k};\n}}\n",
+    }
+    buggy = {lang: code.replace(f"n * {k}", f"n * {k} + 1") for lang, code in solution.items()}
+    stub = {
+        "python": "def solve(n):\n    # your code here\n",
+        "java": "class Solution {\n    int solve(int n) {\n        // your code here\n    }\n}\n",
+        "c++": "int solve(int n) {\n    // your code here\n}\n",
+    }
+    # Same protocol the prompts ask for: a JSON line per test case, then the
+    # "true" / "false-<i>" verdict line.
+    main = {
+        "python": (
+            "if __name__ == '__main__':\n"
+            "    import json, resource, time\n"
+            "    for i in range(1, 11):\n"
+            "        start = time.perf_counter()\n"
+            "        passed = solve(i) == i * __K__\n"
+            "        elapsed_ms = (time.perf_counter() - start) * 1000\n"
+            "        peak_rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss\n"
+            "        print(json.dumps({'test': i, 'passed': passed, 'elapsed_ms': elapsed_ms, 'peak_rss_kb': peak_rss_kb}))\n"
+            "        if not passed:\n"
+            "            print(f'false-{i}')\n"
+            "            break\n"
+            "    else:\n"
+            "        print('true')\n"
+        ),
+        "java": (
+            "import java.util.*;\n"
+            "public class Main {\n"
+            "    public static void main(String[] args) {\n"
+            "        Solution s = new Solution();\n"
+            "        Runtime runtime = Runtime.getRuntime();\n"
+            "        for (int i = 1; i <= 10; i++) {\n"
+            "            long start = System.nanoTime();\n"
+            "            boolean passed = s.solve(i) == i * __K__;\n"
+            "            double elapsedMs = (System.nanoTime() - start) / 1e6;\n"
+            "            long usedKb = (runtime.totalMemory() - runtime.freeMemory()) / 1024;\n"
+            "            System.out.println(\"{\\\"test\\\": \" + i + \", \\\"passed\\\": \" + passed + \", \\\"elapsed_ms\\\": \" + elapsedMs + \", \\\"peak_rss_kb\\\": \" + usedKb + \"}\");\n"
+            "            if (!passed) { System.out.println(\"false-\" + i); return; }\n"
+            "        }\n"
+            "        System.out.println(\"true\");\n"
+            "    }\n"
+            "}\n"
+        ),
+        "c++": (
+            "#include <iostream>\n"
+            "#include <chrono>\n"
+            "#include <sys/resource.h>\n"
+            "using namespace std;\n"
+            "int main() {\n"
+            "    for (int i = 1; i <= 10; i++) {\n"
+            "        auto start = chrono::steady_clock::now();\n"
+            "        bool passed = solve(i) == i * __K__;\n"
+            "        double elapsed_ms = chrono::duration<double, milli>(chrono::steady_clock::now() - start).count();\n"
+            "        struct rusage usage;\n"
+            "        getrusage(RUSAGE_SELF, &usage);\n"
+            "        cout << \"{\\\"test\\\": \" << i << \", \\\"passed\\\": \" << (passed ? \"true\" : \"false\")\n"
+            "             << \", \\\"elapsed_ms\\\": \" << elapsed_ms << \", \\\"peak_rss_kb\\\": \" << usage.ru_maxrss << \"}\" << endl;\n"
+            "        if (!passed) { cout << \"false-\" << i << endl; return 0; }\n"
+            "    }\n"
+            "    cout << \"true\" << endl;\n"
+            "    return 0;\n"
+            "}\n"
+        ),
+    }
+    main = {lang: code.replace("__K__", str(k)) for lang, code in main.items()}
+    q_data = {
+        "question": f"Given an integer n, return n multiplied by {k}. Reference: {filler}",
+        "test_cases": [{"input": "1", "output": str(k)}, {"input": "2", "output": str(2 * k)}],
+        "output_datatype": "int",
+        "boilerplate_code_user": buggy if debugging else stub,
+        "boilerplate_code_main": main,
+    }
+    if not debugging:
+        q_data["reference_solution"] = solution
+    return q_data
+
+
+async def fake_llm(prompt: str) -> str:
+    await asyncio.sleep(random.uniform(0.5, 1.5) * FAKE_LLM_LATENCY)
+    if random.random() < FAKE_LLM_FAILURE_RATE:
+        raise FakeProviderError(random.choice([429, 503]))
+    return "```json\n" + json.dumps(fake_question("debugging question" in prompt)) + "\n```"
@@ -0,0 +1,116 @@
+from fastapi import HTTPException
+from google import genai
+from dotenv import load_dotenv
+import asyncio
+import json
+import os
+import re
+from fastapi_app import metrics
+from fastapi_app.questiongenerator.fake_llm import fake_llm
+from fastapi_app.questiongenerator.llm_scheduler import LLMScheduler, LLMUnavailable, is_retryable
+from fastapi_app.questiongenerator.prompts import coding_prompt,debugging_prompt
+from fastapi_app.questiongenerator.question_store import sample_question_ids, store_question, store_questions
+from fastapi_app.questiongenerator.validator import validate_question
+
+
+# Load env variables
+load_dotenv()
+api_key = os.getenv("GEMINI_API_KEY")
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")  # "fake" for local runs
+
+client = genai.Client(api_key=api_key) if LLM_BACKEND == "gemini" else None
+
+QUESTIONS_PER_ROOM = 3
+DISTINCT_QUESTION_ATTEMPTS = int(os.getenv("DISTINCT_QUESTION_ATTEMPTS", 3))
+LLM_ATTEMPTS = int(os.getenv("GEMINI_ATTEMPTS", 2))  # bad / invalid answers, not provider errors
+
+
+async def gemini(prompt):
+    response = await client.aio.models.generate_content(model="gemini-2.0-flash", contents=[prompt])
+    return response.text
+
+
+# Every LLM call from question generation goes through this one scheduler.
+llm_scheduler = LLMScheduler(
+    gemini if LLM_BACKEND == "gemini" else fake_llm,
+    concurrency=int(os.getenv("LLM_CONCURRENCY", 4)),
+    tokens_per_minute=int(os.getenv("LLM_TOKENS_PER_MINUTE", 1_000_000)),
+    timeout=float(os.getenv("GEMINI_TIMEOUT", 45)),
+    attempts=int(os.getenv("LLM_RETRY_ATTEMPTS", 3)),
+    slow_call_seconds=float(os.getenv("LLM_SLOW_CALL_SECONDS", 20)),
+    breaker_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+    breaker_cooldown=float(os.getenv("LLM_BREAKER_COOLDOWN", 30)),
+)
+
+
+async def generate_prompt_response(prompt):
+    return await llm_scheduler.generate(prompt)
+
+
+def extract_json_block(text):
+    match = re.search(r'{.*}', text, re.DOTALL)
+    if match:
+        return json.loads(match.group(0))
+    else:
+        raise ValueError("No valid JSON found in Gemini response.")
+
+async def generate_question(q_type: str):
+    prompt = coding_prompt if q_type == "coding" else debugging_prompt
+    for attempt in range(1, LLM_ATTEMPTS + 1):
+        try:
+            q_data = extract_json_block(await generate_prompt_response(prompt))
+
+            # Add question type
+            q_data["type"] = q_type
+
+            if q_type == "coding":
+                required_fields = ["question", "test_cases", "output_datatype", "boilerplate_code_user", "boilerplate_code_main"]
+                missing_fields = [field for field in required_fields if field not in q_data]
+
+                if missing_fields:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"Incomplete coding question data. Missing fields: {missing_fields}"
+                    )
+
+            # A broken harness counts as a failed attempt and is regenerated.
+            await validate_question(q_data)
+            return q_data
+        except LLMUnavailable:
+            raise  # the provider is down; the caller falls back to stored questions
+        except Exception as e:
+            # Only this question is retried; the others keep their results.
+            # Provider errors were already retried by the scheduler.
+            if attempt == LLM_ATTEMPTS or is_retryable(e):
+                raise
+            print(f"Question generation attempt {attempt} failed, retrying: {e!r}")
+
+async def generate_question_set(q_type: str):
+    return await asyncio.gather(
+        *(generate_question(q_type) for _ in range(QUESTIONS_PER_ROOM))
+    )
+
+
+async def distinct_question_id(q_type: str, question_id: str, exclude):
+    # A set's questions are generated concurrently from the same prompt and can
+    # be stored as the same (or a near-duplicate) question; replace repeats
+    # with new ones, or a stored question once that keeps failing.
+    attempts = 0
+    while question_id in exclude:
+        metrics.increment("question_set_duplicates")
+        if attempts == DISTINCT_QUESTION_ATTEMPTS:
+            reused = await sample_question_ids(q_type, 1, exclude)
+            if not reused:
+                raise RuntimeError(f"No distinct {q_type} question after {attempts} attempts")
+            return reused[0]
+        attempts += 1
+        question_id = await store_question(await generate_question(q_type))
+    return question_id
+
+
+async def generate_question_ids(q_type: str):
+    # Stores a freshly generated set and returns its QUESTIONS_PER_ROOM ids.
+    question_ids = []
+    for question_id in await store_questions(await generate_question_set(q_type)):
+        question_ids.append(await distinct_question_id(q_type, question_id, question_ids))
+    return question_ids
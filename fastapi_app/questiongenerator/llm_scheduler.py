@@ -0,0 +1,149 @@
+import asyncio
+import random
+import time
+from collections import deque
+from fastapi_app import metrics
+
+# HTTP-ish status codes from the provider that are worth retrying.
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+
+
+class LLMUnavailable(Exception):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+def is_retryable(e: Exception) -> bool:
+    return isinstance(e, (asyncio.TimeoutError, ConnectionError, OSError)) or getattr(e, "code", None) in RETRYABLE_CODES
+
+
+class LLMScheduler:
+    """Single entry point for LLM calls from this process.
+
+    Calls go through a bounded concurrency pool and a sliding per-minute token
+    budget, are retried with full-jitter exponential backoff on timeouts and
+    retryable provider errors, and are short-circuited with LLMUnavailable
+    once the provider has failed or been slow too many times in a row.
+
+    `backend` is any `async (prompt) -> text` callable, so a fake LLM can be
+    swapped in for local runs and benchmarks.
+    """
+
+    def __init__(
+        self,
+        backend,
+        concurrency: int = 4,
+        tokens_per_minute: int = 1_000_000,
+        output_token_estimate: int = 2000,
+        timeout: float = 45,
+        attempts: int = 3,
+        backoff_base: float = 0.5,
+        backoff_cap: float = 8,
+        slow_call_seconds: float = 20,
+        breaker_threshold: int = 5,
+        breaker_cooldown: float = 30,
+    ):
+        self.backend = backend
+        self.tokens_per_minute = tokens_per_minute
+        self.output_token_estimate = output_token_estimate
+        self.timeout = timeout
+        self.attempts = attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.slow_call_seconds = slow_call_seconds
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+
+        self._slots = asyncio.Semaphore(concurrency)
+        self._budget_lock = asyncio.Lock()
+        self._spent = deque()  # (monotonic time, tokens) over the last minute
+        self._waiting = 0
+        self._consecutive_failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+
+    # --- circuit breaker ---
+    def _check_breaker(self) -> bool:
+        if self._opened_at is None:
+            return False
+        if time.monotonic() - self._opened_at < self.breaker_cooldown or self._trial_in_flight:
+            metrics.increment("llm_rejected")
+            raise LLMUnavailable("LLM circuit breaker is open")
+        # Half-open: let one call through to probe the provider.
+        self._trial_in_flight = True
+        return True
+
+    def _record(self, healthy: bool):
+        self._trial_in_flight = False
+        if healthy:
+            self._consecutive_failures = 0
+            self._opened_at = None
+        else:
+            self._consecutive_failures += 1
+            if self._opened_at is not None or self._consecutive_failures >= self.breaker_threshold:
+                if self._opened_at is None:
+                    print(f"LLM circuit breaker opened after {self._consecutive_failures} failures")
+                    metrics.increment("llm_breaker_opened")
+                self._opened_at = time.monotonic()
+        metrics.set_gauge("llm_breaker_open", int(self._opened_at is not None))
+
+    # --- token budget ---
+    async def _reserve_tokens(self, tokens: int):
+        async with self._budget_lock:
+            while True:
+                now = time.monotonic()
+                while self._spent and now - self._spent[0][0] >= 60:
+                    self._spent.popleft()
+                used = sum(t for _, t in self._spent)
+                # An oversized request still goes through once the window is empty.
+                if not self._spent or used + tokens <= self.tokens_per_minute:
+                    self._spent.append((now, tokens))
+                    metrics.set_gauge("llm_tokens_last_minute", used + tokens)
+                    return
+                await asyncio.sleep(60 - (now - self._spent[0][0]))
+
+    def _set_depth(self, delta: int):
+        self._waiting += delta
+        metrics.set_gauge("llm_queue_depth", self._waiting)
+
+    async def _call_once(self, prompt: str):
+        trial = self._check_breaker()
+        queued_at = time.perf_counter()
+        self._set_depth(1)
+        try:
+            async with self._slots:
+                await self._reserve_tokens(len(prompt) // 4 + self.output_token_estimate)
+                self._set_depth(-1)
+                started = time.perf_counter()
+                metrics.observe("llm_queue_wait_ms", (started - queued_at) * 1000)
+                queued_at = None
+                metrics.increment("llm_calls")
+                try:
+                    text = await asyncio.wait_for(self.backend(prompt), timeout=self.timeout)
+                except Exception as e:
+                    self._record(healthy=not is_retryable(e))
+                    raise
+                elapsed = time.perf_counter() - started
+                metrics.observe("llm_latency_ms", elapsed * 1000)
+                # A slow success still counts against the provider's health.
+                self._record(healthy=elapsed < self.slow_call_seconds)
+                return text
+        finally:
+            if queued_at is not None:
+                self._set_depth(-1)
+            if trial:
+                self._trial_in_flight = False  # e.g. the probe was cancelled
+
+    async def generate(self, prompt: str) -> str:
+        for attempt in range(1, self.attempts + 1):
+            try:
+                return await self._call_once(prompt)
+            except LLMUnavailable:
+                raise
+            except Exception as e:
+                if not is_retryable(e) or attempt == self.attempts:
+                    metrics.increment("llm_failures")
+                    raise
+                metrics.increment("llm_retries")
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                print(f"LLM call attempt {attempt} failed ({e!r}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
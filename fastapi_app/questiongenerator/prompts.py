@@ -17,9 +17,17 @@ coding_prompt = """
     - The main function must loop through the test cases, calling the user function and comparing outputs.
         - If all outputs match, print: "true"
         - If any test fails, print: "false-<i>" (1-based index of the failed test case) and stop checking further.
+    - Before the verdict, print one JSON line per test case that was run, on its own line:
+      {"test": <i>, "passed": <true|false>, "elapsed_ms": <float>, "peak_rss_kb": <int>}
+        - elapsed_ms is the wall time of the user function call for that test case only.
+        - peak_rss_kb is the process memory after the call (Python: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, Java: (Runtime.totalMemory() - Runtime.freeMemory()) / 1024, C++: getrusage(RUSAGE_SELF) from <sys/resource.h>).
+        - Time with time.perf_counter() in Python, System.nanoTime() in Java and std::chrono::steady_clock in C++.
+        - The verdict ("true" or "false-<i>") must always be the last line printed.
+
+    4. A correct reference solution for each language, with the same signature as the user boilerplate. It is only used to check the main function and is never shown to players.
 
     Other constraints:
-    - Do not include solution logic anywhere — only skeletons/placeholders.
+    - Do not include solution logic anywhere except reference_solution — only skeletons/placeholders.
     - In Java, import all required libraries in the Main class (not in the Solution class).
     - In Python, use `if __name__ == '__main__'`.
     - In C++, use `int main()` with input/output and call to solve().
@@ -41,6 +49,11 @@ coding_prompt = """
         "python": "if __name__ == '__main__':\\n    # input/output and solve() calls",
         "java": "import java.util.*;\\npublic class Main {\\n    public static void main(String[] args) {\\n        // input/output and call Solution methods\\n    }\\n}",
         "c++": "#include <iostream>\\nusing namespace std;\\n\\nint main() {\\n    // input/output and solve() calls\\n    return 0;\\n}"
+    },
+    "reference_solution": {
+        "python": "def solve(...):\\n    # correct logic",
+        "java": "public class Solution {\\n    // correct logic\\n}",
+        "c++": "#include <iostream>\\nusing namespace std;\\n\\nvoid solve() {\\n    // correct logic\\n}"
     }
     }
     """
@@ -64,6 +77,12 @@ debugging_prompt = """
     - The main function must loop through the test cases, calling the buggy user function and comparing outputs.
         - If all outputs match, print: "true"
         - If any test fails, print: "false-<i>" (1-based index of the failed test case) and stop checking further.
+    - Before the verdict, print one JSON line per test case that was run, on its own line:
+      {"test": <i>, "passed": <true|false>, "elapsed_ms": <float>, "peak_rss_kb": <int>}
+        - elapsed_ms is the wall time of the user function call for that test case only.
+        - peak_rss_kb is the process memory after the call (Python: resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, Java: (Runtime.totalMemory() - Runtime.freeMemory()) / 1024, C++: getrusage(RUSAGE_SELF) from <sys/resource.h>).
+        - Time with time.perf_counter() in Python, System.nanoTime() in Java and std::chrono::steady_clock in C++.
+        - The verdict ("true" or "false-<i>") must always be the last line printed.
 
     Other constraints:
     - Do NOT tell what the bugs are — the user must find and fix them.
@@ -0,0 +1,97 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from fastapi_app.database.mongo import db
+from fastapi_app.queue.queue import acquire_lease, release_lease
+from fastapi_app.questiongenerator.generator import generate_question_ids
+from fastapi_app.questiongenerator.question_store import ensure_question_indexes, store_questions
+
+# Ready-made question sets (QUESTIONS_PER_ROOM each) so room setup is a single
+# findOneAndUpdate instead of waiting on the LLM. Sets are partitioned by
+# room_type and optionally domain; domain None means "fits any domain".
+QUESTION_TYPES = ["coding", "debugging"]
+LOW_WATER = int(os.getenv("QUESTION_BANK_LOW_WATER", 5))
+HIGH_WATER = int(os.getenv("QUESTION_BANK_HIGH_WATER", 10))
+REPLENISH_INTERVAL = float(os.getenv("QUESTION_BANK_REPLENISH_INTERVAL", 60))
+REPLENISH_CONCURRENCY = int(os.getenv("QUESTION_BANK_CONCURRENCY", 2))
+
+# Only one process tops the bank up at a time; the lease outlives a slow run.
+REPLENISH_LEASE = "question_bank:replenish"
+REPLENISH_LEASE_TTL_MS = 10 * 60 * 1000
+REPLENISHER_ID = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+question_bank = db.question_bank
+_replenish_requested = asyncio.Event()
+
+
+async def claim_question_set(room_type: str, room_id: str, domain: str = None):
+    # A room keeps the set it claimed first; asking again must not use up
+    # another one.
+    doc = await question_bank.find_one({"room_id": room_id, "claimed": True})
+    if doc:
+        return await _question_ids(doc)
+    doc = await question_bank.find_one_and_update(
+        {"room_type": room_type, "claimed": False, "domain": {"$in": [domain, None]}},
+        {"$set": {"claimed": True, "room_id": room_id, "claimed_at": datetime.utcnow()}},
+        sort=[("created_at", 1)],
+    )
+    _replenish_requested.set()
+    if not doc:
+        return None
+    return await _question_ids(doc)
+
+
+async def _question_ids(doc):
+    if "question_ids" not in doc:  # set banked before questions were stored by id
+        return await store_questions(doc["questions"])
+    return doc["question_ids"]
+
+
+async def top_up(room_type: str):
+    available = await question_bank.count_documents({"room_type": room_type, "claimed": False})
+    if available >= LOW_WATER:
+        return
+    semaphore = asyncio.Semaphore(REPLENISH_CONCURRENCY)
+
+    async def add_set():
+        async with semaphore:
+            question_ids = await generate_question_ids(room_type)
+        await question_bank.insert_one({
+            "room_type": room_type,
+            "domain": None,
+            "question_ids": question_ids,
+            "claimed": False,
+            "created_at": datetime.utcnow(),
+        })
+
+    results = await asyncio.gather(
+        *(add_set() for _ in range(HIGH_WATER - available)), return_exceptions=True
+    )
+    failed = [r for r in results if isinstance(r, Exception)]
+    if failed:
+        print(f"Question bank: {len(failed)} {room_type} sets failed, e.g. {failed[0]!r}")
+
+
+async def question_bank_replenisher():
+    await question_bank.create_index(
+        [("room_type", 1), ("claimed", 1), ("domain", 1), ("created_at", 1)]
+    )
+    await question_bank.create_index("room_id", sparse=True)
+    await ensure_question_indexes()
+    while True:
+        if await acquire_lease(REPLENISH_LEASE, REPLENISHER_ID, REPLENISH_LEASE_TTL_MS):
+            try:
+                for room_type in QUESTION_TYPES:
+                    await top_up(room_type)
+            except Exception as e:
+                print(f"Question bank replenish failed: {e!r}")
+            finally:
+                await release_lease(REPLENISH_LEASE, REPLENISHER_ID)
+
+        # Wake early when a claim may have taken the bank below the low-water mark.
+        _replenish_requested.clear()
+        try:
+            await asyncio.wait_for(_replenish_requested.wait(), REPLENISH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
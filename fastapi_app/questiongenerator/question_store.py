@@ -0,0 +1,135 @@
+import hashlib
+import random
+import re
+from datetime import datetime
+from pymongo.errors import DuplicateKeyError
+from fastapi_app import metrics
+from fastapi_app.database.mongo import db
+
+# Every generated question is stored once, keyed by the SHA-256 of its type
+# and normalised text, and rooms / bank sets reference it by that key. Near
+# duplicates are caught with a MinHash signature over word shingles, bucketed
+# into LSH bands so candidates come from one indexed $in query.
+SHINGLE_SIZE = 3
+NUM_HASHES = 64
+BAND_ROWS = 4  # 16 bands of 4 rows: ~0.8 Jaccard catches with high probability
+NEAR_DUPLICATE_THRESHOLD = 0.8
+CANDIDATE_LIMIT = 20
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(0x5EED)  # fixed so signatures stay comparable across deploys
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_HASHES)]
+
+questions_collection = db.questions
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(re.sub(r"[^a-z0-9]+", " ", text.lower()).split())
+
+
+def content_hash(q_data) -> str:
+    # The type is part of the key: a debugging question ships buggy code where
+    # a coding question with the same text ships an empty skeleton.
+    key = f"{q_data.get('type', '')}\0{normalize_text(q_data['question'])}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def minhash_signature(text: str):
+    words = normalize_text(text).split()
+    shingles = {" ".join(words[i:i + SHINGLE_SIZE]) for i in range(max(1, len(words) - SHINGLE_SIZE + 1))}
+    hashes = [int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "big") for s in shingles]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMUTATIONS]
+
+
+def lsh_bands(signature):
+    return [
+        f"{i // BAND_ROWS}:" + hashlib.blake2b(
+            repr(signature[i:i + BAND_ROWS]).encode("utf-8"), digest_size=8
+        ).hexdigest()
+        for i in range(0, len(signature), BAND_ROWS)
+    ]
+
+
+def estimated_similarity(a, b) -> float:
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+async def ensure_question_indexes():
+    await questions_collection.create_index("lsh_bands")
+
+
+async def find_near_duplicate(signature, bands, q_type: str = None):
+    cursor = questions_collection.find(
+        {"lsh_bands": {"$in": bands}, "data.type": q_type}, {"minhash": 1}
+    ).limit(CANDIDATE_LIMIT)
+    async for candidate in cursor:
+        if estimated_similarity(signature, candidate["minhash"]) >= NEAR_DUPLICATE_THRESHOLD:
+            return candidate["_id"]
+    return None
+
+
+async def store_question(q_data) -> str:
+    # Returns the id the question is stored under, which is an existing
+    # question's id when this one is an exact or near duplicate of it.
+    question_id = content_hash(q_data)
+    if await questions_collection.find_one({"_id": question_id}, {"_id": 1}):
+        metrics.increment("question_duplicates_exact")
+        return question_id
+
+    signature = minhash_signature(q_data["question"])
+    bands = lsh_bands(signature)
+    existing = await find_near_duplicate(signature, bands, q_data.get("type"))
+    if existing:
+        metrics.increment("question_duplicates_near")
+        return existing
+
+    try:
+        await questions_collection.insert_one({
+            "_id": question_id,
+            "data": {k: v for k, v in q_data.items() if k != "content_hash"},
+            "minhash": signature,
+            "lsh_bands": bands,
+            "created_at": datetime.utcnow(),
+        })
+    except DuplicateKeyError:
+        pass  # stored concurrently by someone else
+    return question_id
+
+
+async def store_questions(questions):
+    return [await store_question(q_data) for q_data in questions]
+
+
+async def sample_question_ids(q_type: str, count: int, exclude=()):
+    # Previously generated questions, reused when the LLM is unavailable.
+    docs = await questions_collection.aggregate([
+        {"$match": {"data.type": q_type, "_id": {"$nin": list(exclude)}}},
+        {"$sample": {"size": count}},
+        {"$project": {"_id": 1}},
+    ]).to_list(length=None)
+    return [doc["_id"] for doc in docs]
+
+
+async def load_questions(question_ids):
+    docs = await questions_collection.find(
+        {"_id": {"$in": list(question_ids)}}, {"data": 1}
+    ).to_list(length=None)
+    by_id = {doc["_id"]: {**doc["data"], "content_hash": doc["_id"]} for doc in docs}
+    return [by_id[qid] for qid in question_ids if qid in by_id]
+
+
+async def get_room_questions(room):
+    # Rooms reference stored questions by id; rooms created before that still
+    # carry them inline.
+    if room.get("question_ids") is not None:
+        return await load_questions(room["question_ids"])
+    return room.get("questions") or []
+
+
+async def get_room_question(room, index: int):
+    if room.get("question_ids") is not None:
+        loaded = await load_questions([room["question_ids"][index]])
+        if not loaded:
+            raise IndexError(index)
+        return loaded[0]
+    return room["questions"][index]
@@ -1,43 +1,109 @@
 from fastapi import APIRouter, HTTPException
-from google import genai
 from motor.motor_asyncio import AsyncIOMotorClient
 from bson import ObjectId
-from dotenv import load_dotenv
-import os
 import random
-import json
 from fastapi import APIRouter
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi_app.database.mongo import db
-import re
 from pydantic import BaseModel
 from typing import List, Dict
-from fastapi_app.questiongenerator.prompts import coding_prompt,debugging_prompt
-
-
-# Load env variables
-load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
+import asyncio
+import json
+import time
+from fastapi_app import metrics
+from fastapi_app.questiongenerator.generator import (
+    QUESTIONS_PER_ROOM,
+    distinct_question_id,
+    generate_question,
+    generate_question_ids,
+)
+from fastapi_app.questiongenerator.llm_scheduler import LLMUnavailable
+from fastapi_app.questiongenerator.question_bank import claim_question_set
+from fastapi_app.questiongenerator.question_store import (
+    get_room_questions,
+    load_questions,
+    sample_question_ids,
+    store_question,
+)
+from fastapi_app.singleflight import SingleFlight
 
-client = genai.Client(api_key=api_key)
 
 router = APIRouter()
 
 # MongoDB
 rooms_collection = db.rooms
 
-async def generate_prompt_response(prompt):
-    response = client.models.generate_content(
-        model="gemini-2.0-flash", contents=[prompt])
-    return response.text
-
-
-def extract_json_block(text):
-    match = re.search(r'{.*}', text, re.DOTALL)
-    if match:
-        return json.loads(match.group(0))
-    else:
-        raise ValueError("No valid JSON found in Gemini response.")
+# Both players usually ask for their room's questions at the same moment; only
+# one generation runs and everyone gets the same set.
+room_questions_flight = SingleFlight("question_generation", lock_ttl_ms=120_000)
+
+
+# Set whenever a room's questions change, so streams in this process wake up
+# without waiting for their next poll.
+_questions_changed = {}
+STREAM_POLL_INTERVAL = 0.25
+_detached_flights = set()
+
+
+def _notify_questions_changed(room_id: str):
+    if room_id in _questions_changed:
+        _questions_changed[room_id].set()
+
+
+async def reuse_stored_question(q_type: str, exclude):
+    reused = await sample_question_ids(q_type, 1, exclude)
+    if not reused:
+        raise HTTPException(status_code=503, detail="Question generation is unavailable, try again shortly.")
+    metrics.increment("questions_reused_llm_unavailable")
+    return reused[0]
+
+
+async def push_questions_as_ready(room_id: str, q_type: str):
+    await rooms_collection.update_one(
+        {"room_id": room_id},
+        {"$set": {"question_ids": []}, "$unset": {"questions": ""}}
+    )
+    question_ids = []
+    pending = [generate_question(q_type) for _ in range(QUESTIONS_PER_ROOM)]
+    for next_question in asyncio.as_completed(pending):
+        try:
+            question_id = await store_question(await next_question)
+            question_id = await distinct_question_id(q_type, question_id, question_ids)
+        except LLMUnavailable:
+            question_id = await reuse_stored_question(q_type, question_ids)
+        await rooms_collection.update_one({"room_id": room_id}, {"$push": {"question_ids": question_id}})
+        question_ids.append(question_id)
+        _notify_questions_changed(room_id)
+    return await load_questions(question_ids)
+
+
+async def assign_questions(room, incremental=False):
+    room_id = room["room_id"]
+    q_type = room["room_type"]
+    # The flight only merges overlapping calls: a player who asks after the
+    # first assignment finished gets the room's existing set, not a new one.
+    current = await rooms_collection.find_one({"room_id": room_id}, {"question_ids": 1, "questions": 1})
+    if current and len(current.get("question_ids") or current.get("questions") or []) >= QUESTIONS_PER_ROOM:
+        return await get_room_questions(current)
+    # Pre-generated set if the bank has one, live LLM calls otherwise.
+    question_ids = await claim_question_set(q_type, room_id, room.get("domain"))
+    if question_ids is None and incremental:
+        return await push_questions_as_ready(room_id, q_type)
+    if question_ids is None:
+        try:
+            question_ids = await generate_question_ids(q_type)
+        except LLMUnavailable:
+            question_ids = await sample_question_ids(q_type, QUESTIONS_PER_ROOM)
+            if len(question_ids) < QUESTIONS_PER_ROOM:
+                raise HTTPException(status_code=503, detail="Question generation is unavailable, try again shortly.")
+            metrics.increment("questions_reused_llm_unavailable", QUESTIONS_PER_ROOM)
+
+    await rooms_collection.update_one(
+        {"room_id": room_id},
+        {"$set": {"question_ids": question_ids}, "$unset": {"questions": ""}}
+    )
+    _notify_questions_changed(room_id)
+    return await load_questions(question_ids)
 
 @router.post("/generate_questions/{room_id}")
 async def generate_questions(room_id: str):
@@ -46,36 +112,7 @@ async def generate_questions(room_id: str):
         if not room:
             raise HTTPException(status_code=404, detail="Room not found")
 
-        questions = []
-        q_type = room["room_type"]
-
-        for _ in range(3):
-            if q_type == "coding":
-                q_data_str = await generate_prompt_response(coding_prompt)
-            else:
-                q_data_str = await generate_prompt_response(debugging_prompt)
-
-            q_data = extract_json_block(q_data_str)
-
-            # Add question type
-            q_data["type"] = q_type
-
-            if q_type == "coding":
-                required_fields = ["question", "test_cases", "output_datatype", "boilerplate_code_user", "boilerplate_code_main"]
-                missing_fields = [field for field in required_fields if field not in q_data]
-
-                if missing_fields:
-                    raise HTTPException(
-                        status_code=400,
-                        detail=f"Incomplete coding question data. Missing fields: {missing_fields}"
-                    )
-
-            questions.append(q_data)
-
-        await rooms_collection.update_one(
-            {"room_id": room_id},
-            {"$set": {"questions": questions}}
-        )
+        questions = await room_questions_flight.run(room_id, lambda: assign_questions(room))
 
         return {"message": "Questions generated successfully", "questions": questions}
 
@@ -85,6 +122,63 @@ async def generate_questions(room_id: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/generate_questions/{room_id}/stream")
+async def stream_questions(room_id: str):
+    # NDJSON variant: one {"index", "question"} line per question as soon as it
+    # is stored, so players can start on the first while the rest generate.
+    room = await rooms_collection.find_one({"room_id": room_id})
+    if not room:
+        raise HTTPException(status_code=404, detail="Room not found")
+
+    async def lines():
+        started = time.perf_counter()
+        changed = _questions_changed.setdefault(room_id, asyncio.Event())
+        flight = asyncio.create_task(
+            room_questions_flight.run(room_id, lambda: assign_questions(room, incremental=True))
+        )
+        sent = 0
+        try:
+            while sent < QUESTIONS_PER_ROOM:
+                finished = flight.done()
+                if finished:
+                    questions = flight.result()  # raises if generation failed
+                else:
+                    # Same process as the generator: woken per question. Other
+                    # processes: picked up by the poll.
+                    try:
+                        await asyncio.wait_for(changed.wait(), STREAM_POLL_INTERVAL)
+                    except asyncio.TimeoutError:
+                        pass
+                    changed.clear()
+                    current = await rooms_collection.find_one(
+                        {"room_id": room_id}, {"question_ids": 1, "questions": 1}
+                    )
+                    questions = await get_room_questions(current or {})
+                for index in range(sent, len(questions)):
+                    if sent == 0:
+                        metrics.observe("time_to_first_question_ms", (time.perf_counter() - started) * 1000)
+                    yield json.dumps({"index": index, "question": questions[index]}) + "\n"
+                    sent += 1
+                if finished and sent < QUESTIONS_PER_ROOM:
+                    # The finished set came up short (e.g. a stored question
+                    # is missing); nothing else is coming.
+                    yield json.dumps({"error": f"Only {sent} of {QUESTIONS_PER_ROOM} questions are available."}) + "\n"
+                    break
+        except Exception as e:
+            detail = e.detail if isinstance(e, HTTPException) else str(e)
+            yield json.dumps({"error": detail}) + "\n"
+        finally:
+            # A client that hangs up does not cancel the generation: the other
+            # player may be waiting on it and the result is already persisted.
+            if not flight.done():
+                _detached_flights.add(flight)
+                flight.add_done_callback(_detached_flights.discard)
+                flight.add_done_callback(lambda f: f.cancelled() or f.exception())
+            _questions_changed.pop(room_id, None)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @router.get("/rooms")
 async def get_all_rooms():
     try:
@@ -106,7 +200,7 @@ async def get_questions_by_user(user_id: str):
         raise HTTPException(
             status_code=404, detail="User not found in any room.")
 
-    questions = room.get("questions")
+    questions = await get_room_questions(room)
     if not questions:
         raise HTTPException(
             status_code=404, detail="No questions found in the room.")
@@ -0,0 +1,87 @@
+import asyncio
+import hashlib
+import json
+import os
+import re
+from fastapi_app import metrics
+from fastapi_app.code_editor import execution
+from fastapi_app.code_editor.execution import build_program, parse_harness_output
+from fastapi_app.queue.redis_connection import async_redis_client
+
+# Generated harnesses are run once before a question is used, so a main that
+# does not compile or never prints the true / false-<i> verdict is caught here
+# instead of by a player's first submission.
+VALIDATION_ENABLED = os.getenv("QUESTION_VALIDATION", "true").lower() == "true"
+VALIDATION_CONCURRENCY = int(os.getenv("QUESTION_VALIDATION_CONCURRENCY", 4))
+VALIDATION_TIMEOUT = float(os.getenv("QUESTION_VALIDATION_TIMEOUT", 30))
+VALIDATION_CACHE_TTL = int(os.getenv("QUESTION_VALIDATION_CACHE_TTL", 7 * 24 * 3600))
+LANGUAGES = ["python", "java", "c++"]
+VERDICT_PATTERN = re.compile(r"^(true|false-\d+)$")
+
+_semaphore = asyncio.Semaphore(VALIDATION_CONCURRENCY)
+
+
+class InvalidQuestion(ValueError):
+    pass
+
+
+async def execute(language: str, source: str):
+    # Results are keyed by backend and exact program, so revalidating a
+    # question (or a duplicate of one) never runs it twice.
+    program = f"{execution.backend.name}\0{language}\0{source}"
+    cache_key = "validation:" + hashlib.sha256(program.encode("utf-8")).hexdigest()
+    cached = await async_redis_client.get(cache_key)
+    if cached:
+        metrics.increment("question_validation_cache_hits")
+        return json.loads(cached)
+
+    async with _semaphore:
+        result = await asyncio.wait_for(execution.execute(language, source), VALIDATION_TIMEOUT)
+    await async_redis_client.set(cache_key, json.dumps(result), ex=VALIDATION_CACHE_TTL)
+    return result
+
+
+async def validate_language(q_data, language: str):
+    main = (q_data.get("boilerplate_code_main") or {}).get(language)
+    if not main:
+        raise InvalidQuestion(f"{language}: no main boilerplate")
+    # With a reference solution the harness must pass; without one it must at
+    # least compile, run and print a verdict in the expected format.
+    reference = (q_data.get("reference_solution") or {}).get(language)
+    code = reference or (q_data.get("boilerplate_code_user") or {}).get(language, "")
+    result = await execute(language, build_program(language, code, main))
+
+    compile_stage = result.get("compile") or {}
+    if compile_stage.get("code"):
+        raise InvalidQuestion(f"{language}: does not compile: {compile_stage.get('output', '')[:200]}")
+    run = result.get("run") or {}
+    output, tests = parse_harness_output(run["stdout"] if "stdout" in run else run.get("output", ""))
+    if reference and (output != "true" or any(t.get("passed") is False for t in tests)):
+        raise InvalidQuestion(f"{language}: reference solution printed {output[:200]!r}")
+    if not VERDICT_PATTERN.match(output):
+        raise InvalidQuestion(f"{language}: unexpected harness output {output[:200]!r}")
+
+
+async def validate_question(q_data):
+    """Raises InvalidQuestion if any language's harness is broken.
+
+    The reference solution, if the model sent one, is only used here and is
+    dropped from q_data afterwards so it is never stored or served.
+    """
+    if not VALIDATION_ENABLED:
+        q_data.pop("reference_solution", None)
+        return
+    try:
+        await asyncio.gather(*(validate_language(q_data, lang) for lang in LANGUAGES))
+    except InvalidQuestion:
+        metrics.increment("question_validation_failed")
+        raise
+    except Exception as e:
+        # The backend being down is not the question's fault; let it through
+        # rather than stalling generation.
+        metrics.increment("question_validation_skipped")
+        print(f"Question validation skipped, execution backend unavailable: {e!r}")
+    else:
+        metrics.increment("question_validation_passed")
+    finally:
+        q_data.pop("reference_solution", None)
@@ -1,77 +1,179 @@
 import asyncio
-import json
+import logging
+import os
 import random
+import socket
+import time
 import uuid
-from fastapi_app.database.mongo import db
-from fastapi_app.queue.redis_connection import redis_client
-from fastapi_app.queue.router import user_sse_connections
+from fastapi_app.database.mongo import db, ensure_indexes
+from fastapi_app.queue.queue import (
+    acquire_lease,
+    get_active_queues,
+    get_users_in_room,
+    mark_users_in_room,
+    parse_queue_key,
+    publish_match,
+    rebuild_active_queues,
+    record_match_waits,
+    release_lease,
+    release_users_from_room,
+    renew_lease,
+    signal_queue,
+    take_users,
+    unregister_queue_if_empty,
+    wait_for_wakeup,
+)
+from fastapi_app.queue.redis_connection import REDIS_SOCKET_TIMEOUT, async_redis_client
 ROOM_SIZE = 2
 ROOM_TYPES = ["coding", "debugging"]  # define possible challenge types
+REGISTRY_RECOVERY_EVERY = 30  # sweeps between SCAN-based registry repairs
+MATCH_WINDOW = int(os.getenv("MATCHMAKING_WINDOW", 200))  # head entries considered per pass
+
+# Rating tolerance for a user's partners grows with how long they have waited,
+# so thin domains trade match quality for wait time instead of stalling. The
+# periodic sweep is what lets a widened tolerance pick up a partner.
+TOLERANCE = (
+    float(os.getenv("MATCHMAKING_BASE_TOLERANCE", 100)),
+    float(os.getenv("MATCHMAKING_TOLERANCE_PER_SECOND", 10)),
+    float(os.getenv("MATCHMAKING_MAX_TOLERANCE", 1000)),
+)
+
+# With wake-on-enqueue the full sweep is only a safety net for missed signals.
+EVENT_DRIVEN = os.getenv("MATCHMAKING_EVENT_DRIVEN", "true").lower() == "true"
+SWEEP_INTERVAL = float(os.getenv("MATCHMAKING_SWEEP_INTERVAL", 30 if EVENT_DRIVEN else 10))
+WAKEUP_WAIT = REDIS_SOCKET_TIMEOUT / 2
+
+# Any number of matcher processes can run; each queue is worked by whoever
+# holds its lease. A crashed matcher's leases lapse after LEASE_TTL_MS.
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+LEASE_TTL_MS = int(os.getenv("MATCHMAKING_LEASE_TTL_MS", 5000))
+LEASE_RETRY_DELAY = 0.05
+RECOVERY_LEASE = "matchmaking:recovery"
+_resignals = set()  # keeps fire-and-forget retry tasks referenced
+
+# A room keeps status "active" after its challenge ends, so both fields matter.
+ACTIVE_ROOM_FILTER = {"status": "active", "challenge_status": {"$ne": "ended"}}
+
+async def sync_room_users():
+    # Reconcile the Redis room_users set with Mongo: add everyone in an active
+    # room, then resolve current members with a single $in query and drop the
+    # ones whose room has ended through a path that did not release them.
+    active_ids = set()
+    async for room in db.rooms.find(ACTIVE_ROOM_FILTER, {"users.user_id": 1}):
+        active_ids.update(user["user_id"] for user in room.get("users", []))
+    await mark_users_in_room(list(active_ids))
+
+    members = await get_users_in_room()
+    if not members:
+        return
+    still_busy = set()
+    query = {**ACTIVE_ROOM_FILTER, "users.user_id": {"$in": members}}
+    async for room in db.rooms.find(query, {"users.user_id": 1}):
+        still_busy.update(user["user_id"] for user in room.get("users", []))
+    await release_users_from_room([uid for uid in members if uid not in still_busy])
+
+async def create_room(domain: str, room_type: str, users):
+    room_id = str(uuid.uuid4())
+    room = {
+        "room_id": room_id,
+        "domain": domain,
+        "room_type": room_type if room_type in ROOM_TYPES else random.choice(ROOM_TYPES),
+        "users": users,
+        "status": "active"
+    }
+    await db.rooms.insert_one(room)
+    user_ids = [user["user_id"] for user in users]
+    await mark_users_in_room(user_ids)
+    print(f"Room created: {room}")
+    await publish_match(room_id, user_ids)
+    now = time.time()
+    await record_match_waits(domain, [now - user["enqueued_at"] for user in users])
+
+async def match_queue(key: str) -> bool:
+    if not await acquire_lease(key, WORKER_ID, LEASE_TTL_MS):
+        return False  # another matcher is on it
+
+    domain, room_type = parse_queue_key(key)
+    print("Into Matchmaking ")
+    try:
+        # One script call per room; users already in a room are dropped from
+        # the queue and nobody else can take from this queue meanwhile.
+        while True:
+            users = await take_users(key, ROOM_SIZE, MATCH_WINDOW, TOLERANCE)
+            if not users:
+                break
+            await create_room(domain, room_type, users)
+            if not await renew_lease(key, WORKER_ID, LEASE_TTL_MS):
+                break  # lease lapsed, let the new owner carry on
+
+        await unregister_queue_if_empty(key)
+    finally:
+        await release_lease(key, WORKER_ID)
+    return True
+
+async def resignal_later(key: str):
+    # The lease holder may already be past the point where it would see the
+    # user that triggered this wakeup, so look again once it is done.
+    await asyncio.sleep(LEASE_RETRY_DELAY)
+    await signal_queue(key)
+
+async def sweep_all_queues():
+    for key in await get_active_queues():
+        await match_queue(key)
+
+async def matchmaking_pass(sweeps: int):
+    recovery_ttl_ms = int(SWEEP_INTERVAL * REGISTRY_RECOVERY_EVERY * 1000)
+    if sweeps % REGISTRY_RECOVERY_EVERY == 0 and await acquire_lease(
+        RECOVERY_LEASE, WORKER_ID, recovery_ttl_ms
+    ):
+        await rebuild_active_queues()
+        await sync_room_users()
+
+    await sweep_all_queues()
+
+    if not EVENT_DRIVEN:
+        await asyncio.sleep(SWEEP_INTERVAL)
+        return
+
+    # Block on the wakeup list and match only the signalled queues until
+    # the safety-net sweep is due. Each BLPOP stays under the socket timeout.
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + SWEEP_INTERVAL
+    while (remaining := deadline - loop.time()) > 0:
+        for key in await wait_for_wakeup(min(remaining, WAKEUP_WAIT)):
+            if not await match_queue(key):
+                task = asyncio.create_task(resignal_later(key))
+                _resignals.add(task)
+                task.add_done_callback(_resignals.discard)
 
-async def is_user_already_in_room(user_id: str) -> bool:
-    existing = await db.rooms.find_one({
-        "status": "active",
-        "users.user_id": user_id
-    })
-    return existing is not None
 
 async def matchmaking_loop():
+    # A Redis/Mongo error fails one pass, not the matcher: queue leases
+    # expire on their own and the next pass picks everything up again.
+    indexed = False
+    sweeps = 0
     while True:
-        keys = redis_client.keys("queue:*")
-
-        for key in keys:
-            decoded_key = key.decode("utf-8")
-            domain = decoded_key.split(":")[1]
-            length = redis_client.llen(key)
-            print("Into Matchmaking ")
-            while length >= ROOM_SIZE:
-                users = []
-                skipped_users = []
-
-                for _ in range(length):
-                    user_data = redis_client.lpop(key)
-                    if not user_data:
-                        continue
-
-                    user = json.loads(user_data)
-
-                    if await is_user_already_in_room(user["user_id"]):
-                        print(f"Skipping {user['user_id']}: already in a room")
-                        continue
-
-                    users.append(user)
-
-                    if len(users) == ROOM_SIZE:
-                        break
-
-                for user in skipped_users:
-                    redis_client.rpush(key, json.dumps(user))
-                print(users)
-                if len(users) == ROOM_SIZE:
-                    room_id = str(uuid.uuid4())
-                    room = {
-                        "room_id": room_id,
-                        "domain": domain,
-                        "room_type": random.choice(ROOM_TYPES),
-                        "users": users,
-                        "status": "active"
-                    }
-                    await db.rooms.insert_one(room)
-                    print(f"Room created: {room}")
-                    for user in users:
-                        uid = user["user_id"]
-                        if uid in user_sse_connections:
-                            user_sse_connections[uid]["room_id"] = room_id
-                            user_sse_connections[uid]["event"].set()
-                else:
-                    for user in users:
-                        redis_client.rpush(key, json.dumps(user))
-                    break
-
-                length = redis_client.llen(key)
-
-
-        await asyncio.sleep(10)
-
-#         await asyncio.sleep(10000)
+        try:
+            if not indexed:
+                await ensure_indexes()
+                indexed = True
+            await matchmaking_pass(sweeps)
+            sweeps += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Matchmaking pass failed, retrying: {e!r}")
+            await asyncio.sleep(1)
+
+
+async def main():
+    try:
+        await matchmaking_loop()
+    finally:
+        await async_redis_client.aclose()
+
 
+# Standalone matcher: python -m fastapi_app.queue.matchmaking_worker
+# Run as many as needed and set MATCHMAKER_IN_PROCESS=false on the API.
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,45 +1,335 @@
-import redis
 import json
-from fastapi_app.queue.redis_connection import redis_client
+import os
+import time
+from fastapi_app.queue.redis_connection import async_redis_client
 
-def get_queue_key(domain: str, room_type: str) -> str:
-    return f"queue:{domain}:{room_type}"
+# Set of queue keys that currently hold at least one user. The matchmaking
+# worker sweeps this instead of running KEYS over the whole keyspace.
+ACTIVE_QUEUES_KEY = "active_queues"
 
+# Queue keys pushed here on every enqueue; the worker BLPOPs this list so it
+# can match as soon as a partner arrives instead of waiting for a sweep.
+WAKEUP_KEY = "matchmaking:wakeup"
 
-def is_user_already_in_queue(domain: str, room_type: str, user_id: str) -> bool:
+# Recent enqueue-to-room waits per domain, newest first, for percentiles.
+MATCH_WAIT_SAMPLES = 1000
+
+# user_ids currently playing in an active room. Written on room creation and
+# room end, so the matcher never has to ask Mongo who is busy.
+ROOM_USERS_KEY = "room_users"
+
+# Every formed room is published here once; each API process runs a single
+# subscriber that wakes whichever of the room's users are connected to it.
+MATCH_CHANNEL = "matchmaking:matches"
+
+# Queues are sorted sets of user_ids scored by enqueue time, so the oldest
+# waiters come first and ZSCORE doubles as the duplicate check. A companion
+# ratings:<queue> sorted set scores the same users by skill rating, which lets
+# the matcher find partners with a range query instead of comparing everyone.
+DEFAULT_RATING = float(os.getenv("MATCHMAKING_DEFAULT_RATING", 1000))
+
+# Drops a queue from the registry only if it is really empty, so a concurrent
+# enqueue can never be un-registered by a dequeue that raced with it.
+UNREGISTER_IF_EMPTY_SCRIPT = """
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    return redis.call('SREM', KEYS[2], KEYS[1])
+end
+return 0
+"""
+
+# The rating score is the whole rating plus the enqueue time (mod 2**24 s,
+# about 194 days) as a fraction, so a range query over one rating returns the
+# longest waiters first. A double keeps ~0.1 ms of that for ratings < 2**15.
+ENQUEUE_SCRIPT = """
+if redis.call('ZADD', KEYS[1], 'NX', ARGV[2], ARGV[1]) == 0 then
+    return 0
+end
+local tie_period = 16777216
+local tie = tonumber(ARGV[2]) % tie_period / tie_period
+redis.call('ZADD', KEYS[2], math.floor(tonumber(ARGV[3])) + tie, ARGV[1])
+redis.call('SADD', KEYS[3], KEYS[1])
+redis.call('RPUSH', KEYS[4], KEYS[1])
+return 1
+"""
+
+POP_SCRIPT = """
+local popped = redis.call('ZPOPMIN', KEYS[1], ARGV[1])
+for i = 1, #popped, 2 do
+    redis.call('ZREM', KEYS[2], popped[i])
+end
+if redis.call('ZCARD', KEYS[1]) == 0 then
+    redis.call('SREM', KEYS[3], KEYS[1])
+end
+return popped
+"""
+
+# Walks the ARGV[2] longest waiters. Anyone found in a room (KEYS[4]) is
+# dropped from the queue on the way: rooms that are abandoned rather than
+# ended keep their users in that set, and leaving them queued would let them
+# fill the head of the window for good. They can queue again once free. For
+# each waiter it looks for the ARGV[1] - 1 partners nearest in rating, within
+# a tolerance that grows with that user's wait, using two LIMITed range
+# queries on the rating index (one each side of the anchor). Ratings are
+# scored with the enqueue time as a fraction (see ENQUEUE_SCRIPT), so equal
+# ratings (every unrated user shares the default) come out in wait order. The
+# first anchor that fills a room wins; no one else is removed otherwise.
+TAKE_USERS_SCRIPT = """
+local room_size = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local base_tolerance = tonumber(ARGV[4])
+local widen_per_second = tonumber(ARGV[5])
+local max_tolerance = tonumber(ARGV[6])
+local default_rating = tonumber(ARGV[7])
+local wanted = room_size - 1
+
+local function drop(uid)
+    redis.call('ZREM', KEYS[1], uid)
+    redis.call('ZREM', KEYS[2], uid)
+end
+
+local heads = {}
+while #heads < window do
+    local raw = redis.call('ZRANGE', KEYS[1], #heads, window - 1, 'WITHSCORES')
+    if #raw == 0 then
+        break
+    end
+    for i = 1, #raw, 2 do
+        if redis.call('SISMEMBER', KEYS[4], raw[i]) == 1 then
+            drop(raw[i])
+        else
+            heads[#heads + 1] = {raw[i], tonumber(raw[i + 1])}
+        end
+    end
+end
+
+-- Up to `wanted` queued users from one side of the anchor, nearest first.
+local function nearest(command, from, to, found)
+    local kept = 0
+    while kept < wanted do
+        local asked = wanted - kept
+        local raw = redis.call(command, KEYS[2], from, to, 'WITHSCORES', 'LIMIT', 0, asked)
+        for i = 1, #raw, 2 do
+            local waited_since = tonumber(redis.call('ZSCORE', KEYS[1], raw[i]))
+            if not waited_since or redis.call('SISMEMBER', KEYS[4], raw[i]) == 1 then
+                drop(raw[i])
+            else
+                found[#found + 1] = {raw[i], waited_since, math.floor(tonumber(raw[i + 1]))}
+                kept = kept + 1
+            end
+        end
+        if #raw < 2 * asked then
+            break  -- nothing more in range
+        end
+    end
+end
+
+for _, anchor in ipairs(heads) do
+    local score = redis.call('ZSCORE', KEYS[2], anchor[1])
+    local rating = score and math.floor(tonumber(score)) or math.floor(default_rating)
+    anchor[3] = rating
+    local tolerance = math.floor(math.min(base_tolerance + widen_per_second * (now - anchor[2]), max_tolerance))
+    local candidates = {}
+    if score then
+        nearest('ZRANGEBYSCORE', '(' .. score, '(' .. (rating + tolerance + 1), candidates)
+        nearest('ZREVRANGEBYSCORE', '(' .. score, rating - tolerance, candidates)
+    end
+    if #candidates >= wanted then
+        table.sort(candidates, function(x, y)
+            local dx, dy = math.abs(x[3] - rating), math.abs(y[3] - rating)
+            if dx ~= dy then
+                return dx < dy
+            end
+            return x[2] < y[2]
+        end)
+        local picked = {anchor}
+        for j = 1, wanted do
+            picked[#picked + 1] = candidates[j]
+        end
+        local taken = {}
+        for _, user in ipairs(picked) do
+            drop(user[1])
+            taken[#taken + 1] = {user_id = user[1], enqueued_at = user[2], rating = user[3]}
+        end
+        if redis.call('ZCARD', KEYS[1]) == 0 then
+            redis.call('SREM', KEYS[3], KEYS[1])
+        end
+        return cjson.encode(taken)
+    end
+end
+return false
+"""
+
+# Per-queue leases let several matcher processes share the work. Only the
+# owner that set the lease may extend or drop it.
+RENEW_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_unregister_if_empty = async_redis_client.register_script(UNREGISTER_IF_EMPTY_SCRIPT)
+_enqueue = async_redis_client.register_script(ENQUEUE_SCRIPT)
+_pop = async_redis_client.register_script(POP_SCRIPT)
+_take_users = async_redis_client.register_script(TAKE_USERS_SCRIPT)
+_renew_lease = async_redis_client.register_script(RENEW_LEASE_SCRIPT)
+_release_lease = async_redis_client.register_script(RELEASE_LEASE_SCRIPT)
+
+
+def get_queue_key(domain: str, room_type: str = None) -> str:
+    return f"queue:{domain}:{room_type or 'any'}"
+
+
+def parse_queue_key(queue_key: str):
+    _, domain, room_type = queue_key.split(":", 2)
+    return domain, room_type
+
+
+def get_ratings_key(queue_key: str) -> str:
+    return f"ratings:{queue_key}"
+
+
+def get_match_waits_key(domain: str) -> str:
+    return f"match_waits:{domain}"
+
+
+def get_lease_key(queue_key: str) -> str:
+    return f"lease:{queue_key}"
+
+
+async def acquire_lease(queue_key: str, owner: str, ttl_ms: int) -> bool:
+    return bool(await async_redis_client.set(get_lease_key(queue_key), owner, nx=True, px=ttl_ms))
+
+
+async def renew_lease(queue_key: str, owner: str, ttl_ms: int) -> bool:
+    return bool(await _renew_lease(keys=[get_lease_key(queue_key)], args=[owner, ttl_ms]))
+
+
+async def release_lease(queue_key: str, owner: str):
+    await _release_lease(keys=[get_lease_key(queue_key)], args=[owner])
+
+
+async def unregister_queue_if_empty(queue_key: str) -> bool:
+    return bool(await _unregister_if_empty(keys=[queue_key, ACTIVE_QUEUES_KEY]))
+
+
+async def get_active_queues():
+    return [key.decode("utf-8") for key in await async_redis_client.smembers(ACTIVE_QUEUES_KEY)]
+
+
+async def rebuild_active_queues() -> int:
+    # Recovery path: SCAN (never KEYS) for non-empty queues that are missing
+    # from the registry, e.g. after a restore or a manual edit.
+    added = 0
+    async for key in async_redis_client.scan_iter(match="queue:*", count=1000, _type="zset"):
+        added += await async_redis_client.sadd(ACTIVE_QUEUES_KEY, key)
+    return added
+
+
+async def wait_for_wakeup(timeout: float):
+    # Blocks until at least one enqueue happened (or timeout) and returns the
+    # distinct queue keys that were signalled, draining any backlog at once.
+    item = await async_redis_client.blpop([WAKEUP_KEY], timeout=timeout)
+    if item is None:
+        return []
+    pipe = async_redis_client.pipeline()
+    pipe.lrange(WAKEUP_KEY, 0, -1)
+    pipe.delete(WAKEUP_KEY)
+    backlog, _ = await pipe.execute()
+    keys = [item[1]] + backlog
+    return list(dict.fromkeys(key.decode("utf-8") for key in keys))
+
+
+async def signal_queue(queue_key: str):
+    await async_redis_client.rpush(WAKEUP_KEY, queue_key)
+
+
+async def publish_match(room_id: str, user_ids):
+    message = json.dumps({"room_id": room_id, "user_ids": list(user_ids)})
+    await async_redis_client.publish(MATCH_CHANNEL, message)
+
+
+async def is_user_already_in_queue(domain: str, room_type: str, user_id: str) -> bool:
     queue_key = get_queue_key(domain, room_type)
-    queue = redis_client.lrange(queue_key, 0, -1)
-    for item in queue:
-        data = json.loads(item)
-        if data["user_id"] == user_id:
-            return True
-    return False
+    return await async_redis_client.zscore(queue_key, user_id) is not None
+
+
+async def enqueue_user(domain: str, user_id: str, room_type: str = None, rating: float = None) -> bool:
+    queue_key = get_queue_key(domain, room_type)
+    added = await _enqueue(
+        keys=[queue_key, get_ratings_key(queue_key), ACTIVE_QUEUES_KEY, WAKEUP_KEY],
+        args=[user_id, time.time(), DEFAULT_RATING if rating is None else rating],
+    )
+    return bool(added)  # False: already in queue
+
+
+async def pop_users(queue_key: str, count=1):
+    popped = await _pop(
+        keys=[queue_key, get_ratings_key(queue_key), ACTIVE_QUEUES_KEY],
+        args=[count],
+    )
+    return [
+        {"user_id": popped[i].decode("utf-8"), "enqueued_at": float(popped[i + 1])}
+        for i in range(0, len(popped), 2)
+    ]
+
+
+async def take_users(queue_key: str, room_size: int, window: int, tolerance):
+    base_tolerance, widen_per_second, max_tolerance = tolerance
+    taken = await _take_users(
+        keys=[queue_key, get_ratings_key(queue_key), ACTIVE_QUEUES_KEY, ROOM_USERS_KEY],
+        args=[room_size, window, time.time(), base_tolerance, widen_per_second,
+              max_tolerance, DEFAULT_RATING],
+    )
+    return json.loads(taken) if taken else []
+
+
+async def record_match_waits(domain: str, waits):
+    key = get_match_waits_key(domain)
+    pipe = async_redis_client.pipeline()
+    pipe.lpush(key, *waits)
+    pipe.ltrim(key, 0, MATCH_WAIT_SAMPLES - 1)
+    await pipe.execute()
+
+
+async def get_match_wait_percentiles(domain: str):
+    samples = sorted(float(w) for w in await async_redis_client.lrange(get_match_waits_key(domain), 0, -1))
+    if not samples:
+        return {"samples": 0}
+
+    def percentile(p):
+        return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+    return {"samples": len(samples), "p50": percentile(50), "p90": percentile(90), "p99": percentile(99)}
+
+
+async def mark_users_in_room(user_ids):
+    if user_ids:
+        await async_redis_client.sadd(ROOM_USERS_KEY, *user_ids)
 
 
-def enqueue_user(domain: str, user_id: str) -> bool:
-    queue_key = f"queue:{domain}"
+async def release_users_from_room(user_ids):
+    if user_ids:
+        await async_redis_client.srem(ROOM_USERS_KEY, *user_ids)
 
-    existing_users = redis_client.lrange(queue_key, 0, -1)
-    for u in existing_users:
-        user = json.loads(u)
-        if user["user_id"] == user_id:
-            return False  # already in queue
 
-    user_data = {"user_id": user_id}
-    redis_client.rpush(queue_key, json.dumps(user_data))
-    return True
+async def get_users_in_room():
+    return [uid.decode("utf-8") for uid in await async_redis_client.smembers(ROOM_USERS_KEY)]
 
 
-def dequeue_users(domain: str, room_type: str, batch_size=1):
+async def dequeue_users(domain: str, room_type: str, batch_size=1):
     queue_key = get_queue_key(domain, room_type)
-    users = []
-    for _ in range(batch_size):
-        user_data = redis_client.lpop(queue_key)
-        if user_data:
-            users.append(json.loads(user_data))
-    return users
+    return await pop_users(queue_key, batch_size)
 
 
-def get_queue_length(domain: str, room_type: str):
+async def get_queue_length(domain: str, room_type: str):
     queue_key = get_queue_key(domain, room_type)
-    return redis_client.llen(queue_key)
+    return await async_redis_client.zcard(queue_key)
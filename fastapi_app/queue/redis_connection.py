@@ -1,12 +1,37 @@
 from dotenv import load_dotenv
 import os
 import redis
+import redis.asyncio as aioredis
 
 load_dotenv()
 
+REDIS_HOST = os.getenv('REDIS_HOST')
+REDIS_PORT = int(os.getenv('REDIS_PORT'))
+REDIS_PASSWORD = os.getenv('REDIS_PASSWORD')
+REDIS_SSL = os.getenv('REDIS_SSL', 'true').lower() == 'true'
+
+# Blocking commands (the matchmaker's BLPOP) must wait less than this.
+REDIS_SOCKET_TIMEOUT = float(os.getenv('REDIS_SOCKET_TIMEOUT', 10))
+
+# Synchronous client, only for the Django views.
 redis_client = redis.Redis(
-    host=os.getenv('REDIS_HOST'),
-    port=int(os.getenv('REDIS_PORT')),
-    password=os.getenv('REDIS_PASSWORD'),
-    ssl=True
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    ssl=REDIS_SSL
+)
+
+# Everything running on the FastAPI event loop uses this one. The pool blocks
+# (up to REDIS_POOL_TIMEOUT) instead of erroring when all connections are busy.
+async_redis_pool = aioredis.BlockingConnectionPool(
+    connection_class=aioredis.SSLConnection if REDIS_SSL else aioredis.Connection,
+    host=REDIS_HOST,
+    port=REDIS_PORT,
+    password=REDIS_PASSWORD,
+    max_connections=int(os.getenv('REDIS_MAX_CONNECTIONS', 50)),
+    timeout=float(os.getenv('REDIS_POOL_TIMEOUT', 5)),
+    socket_timeout=REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=float(os.getenv('REDIS_CONNECT_TIMEOUT', 5)),
+    health_check_interval=int(os.getenv('REDIS_HEALTH_CHECK_INTERVAL', 30)),
 )
+async_redis_client = aioredis.Redis(connection_pool=async_redis_pool)
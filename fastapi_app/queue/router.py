@@ -1,6 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from fastapi_app.queue.queue import enqueue_user, dequeue_users, get_queue_length
+from typing import Optional
+from fastapi_app.queue.queue import (
+    MATCH_CHANNEL,
+    enqueue_user,
+    dequeue_users,
+    get_match_wait_percentiles,
+    get_queue_length,
+    release_users_from_room,
+)
+from fastapi_app.queue.redis_connection import REDIS_SOCKET_TIMEOUT, async_redis_client
 # fastapi_app/queue/matcher_sse.py
 import asyncio
 from fastapi import Request
@@ -19,10 +28,41 @@ user_sse_connections = {}
 router = APIRouter()
 
 
+def notify_match(user_ids, room_id: str):
+    for uid in user_ids:
+        if uid in user_sse_connections:
+            user_sse_connections[uid]["room_id"] = room_id
+            user_sse_connections[uid]["event"].set()
+
+
+async def match_notification_listener():
+    # One subscription per process, fanned out to the local SSE waiters. The
+    # matcher may be in another process (or several), so this is the only path
+    # by which a waiting client learns its room_id.
+    while True:
+        pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+        try:
+            await pubsub.subscribe(MATCH_CHANNEL)
+            while True:
+                message = await pubsub.get_message(timeout=REDIS_SOCKET_TIMEOUT / 2)
+                if message is None:
+                    continue
+                data = json.loads(message["data"])
+                notify_match(data["user_ids"], data["room_id"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Match notification listener failed, resubscribing: {e}")
+            await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+
 class QueueRequest(BaseModel):
     domain: str
-    room_type: str
+    room_type: Optional[str] = None
     user_id: str
+    rating: Optional[float] = None
 
 @router.get("/queue/join")
 async def sse_queue_listener(request: Request, user_id: str):
@@ -41,23 +81,30 @@ async def sse_queue_listener(request: Request, user_id: str):
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
 @router.post("/queue/enqueue")
-def add_user_to_queue(req: dict):
-    enqueue_user(req.domain, req.room_type, req.user_id)
+async def add_user_to_queue(req: QueueRequest):
+    if not await enqueue_user(req.domain, req.user_id, req.room_type, req.rating):
+        raise HTTPException(status_code=400, detail="User already in queue")
     return {"message": "User added to queue"}
 
 
 @router.get("/queue/dequeue")
-def simulate_room_formation(domain: str, room_type: str):
-    users = dequeue_users(domain, room_type, batch_size=1)
+async def simulate_room_formation(domain: str, room_type: str):
+    users = await dequeue_users(domain, room_type, batch_size=1)
     return {"users": users}
 
 
 @router.get("/queue/length")
-def get_queue_size(domain: str, room_type: str):
-    length = get_queue_length(domain, room_type)
+async def get_queue_size(domain: str, room_type: str):
+    length = await get_queue_length(domain, room_type)
     return {"queue_length": length}
 
 
+@router.get("/queue/stats")
+async def get_queue_stats(domain: str):
+    # Time-to-match percentiles (seconds) over the domain's recent rooms.
+    return {"domain": domain, "time_to_match": await get_match_wait_percentiles(domain)}
+
+
 
 
 
@@ -75,6 +122,7 @@ async def remove_user_from_room(request: Request):
 
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Room or user not found or no change")
+    await release_users_from_room([user_id])
 
     room = await db.rooms.rooms_collection.find_one({"room_id": room_id})
     if room and (not room.get("users") or len(room["users"]) == 0):
@@ -0,0 +1,42 @@
+# Blocking counterparts of the queue helpers for the Django views, which cannot
+# share the asyncio client. They run the same scripts, so both sides agree on
+# the queue, rating and wakeup keys.
+import time
+from fastapi_app.queue.queue import (
+    ACTIVE_QUEUES_KEY,
+    DEFAULT_RATING,
+    ENQUEUE_SCRIPT,
+    POP_SCRIPT,
+    WAKEUP_KEY,
+    get_queue_key,
+    get_ratings_key,
+)
+from fastapi_app.queue.redis_connection import redis_client
+
+_enqueue = redis_client.register_script(ENQUEUE_SCRIPT)
+_pop = redis_client.register_script(POP_SCRIPT)
+
+
+def enqueue_user(domain: str, user_id: str, room_type: str = None, rating: float = None) -> bool:
+    queue_key = get_queue_key(domain, room_type)
+    added = _enqueue(
+        keys=[queue_key, get_ratings_key(queue_key), ACTIVE_QUEUES_KEY, WAKEUP_KEY],
+        args=[user_id, time.time(), DEFAULT_RATING if rating is None else rating],
+    )
+    return bool(added)
+
+
+def dequeue_users(domain: str, room_type: str, batch_size=1):
+    queue_key = get_queue_key(domain, room_type)
+    popped = _pop(
+        keys=[queue_key, get_ratings_key(queue_key), ACTIVE_QUEUES_KEY],
+        args=[batch_size],
+    )
+    return [
+        {"user_id": popped[i].decode("utf-8"), "enqueued_at": float(popped[i + 1])}
+        for i in range(0, len(popped), 2)
+    ]
+
+
+def get_queue_length(domain: str, room_type: str):
+    return redis_client.zcard(get_queue_key(domain, room_type))
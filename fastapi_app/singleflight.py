@@ -0,0 +1,68 @@
+import asyncio
+import json
+import os
+import uuid
+from fastapi_app import metrics
+from fastapi_app.queue.queue import acquire_lease, release_lease
+from fastapi_app.queue.redis_connection import async_redis_client
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one execution.
+
+    Callers in this process await one shared task. Across processes the
+    leader holds a Redis lease and publishes its JSON result under a short-lived
+    key that the other processes poll for. Results must be JSON-serialisable.
+    """
+
+    def __init__(self, name: str, lock_ttl_ms: int, result_ttl_ms: int = 60_000, poll_interval: float = 0.1):
+        self.name = name
+        self.lock_ttl_ms = lock_ttl_ms
+        self.result_ttl_ms = result_ttl_ms
+        self.poll_interval = poll_interval
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._inflight = {}
+
+    async def run(self, key: str, fn):
+        if key in self._inflight:
+            metrics.increment(f"{self.name}_coalesced")
+        else:
+            # The work runs in its own task, so a caller that goes away (e.g.
+            # a client disconnect cancelling its request) does not cancel it
+            # for everyone else waiting on the same key.
+            task = asyncio.create_task(self._run_once_across_processes(key, fn))
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(self._inflight[key])
+
+    def _finished(self, key: str, task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # consumed here if nobody was still waiting
+
+    async def _run_once_across_processes(self, key: str, fn):
+        lock_key = f"singleflight:{self.name}:{key}"
+        result_key = f"{lock_key}:result"
+        saw_leader = False
+        while True:
+            if saw_leader:
+                cached = await async_redis_client.get(result_key)
+                if cached is not None:
+                    metrics.increment(f"{self.name}_coalesced")
+                    return json.loads(cached)
+
+            if await acquire_lease(lock_key, self.owner, self.lock_ttl_ms):
+                try:
+                    await async_redis_client.delete(result_key)  # never serve a previous run
+                    metrics.increment(f"{self.name}_runs")
+                    result = await fn()
+                    await async_redis_client.set(result_key, json.dumps(result), px=self.result_ttl_ms)
+                    return result
+                finally:
+                    await release_lease(lock_key, self.owner)
+
+            # Another process is running it. If it fails without a result, the
+            # next acquire succeeds and this caller runs it instead.
+            saw_leader = True
+            await asyncio.sleep(self.poll_interval)
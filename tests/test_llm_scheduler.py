@@ -0,0 +1,196 @@
+import asyncio
+
+import pytest
+
+from fastapi_app.questiongenerator import llm_scheduler
+from fastapi_app.questiongenerator.fake_llm import FakeProviderError
+from fastapi_app.questiongenerator.llm_scheduler import LLMScheduler, LLMUnavailable
+
+_real_sleep = asyncio.sleep
+
+
+class FakeClock:
+    """Stands in for the scheduler's time module and asyncio.sleep, so budget
+    waits and backoff delays take no real time and can be asserted on."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def perf_counter(self):
+        return self.now
+
+    async def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+        await _real_sleep(0)
+
+
+class FakeLLM:
+    """Plays back a script of outcomes: a string is returned, an exception is
+    raised, and a (seconds, text) pair is a reply that takes that long."""
+
+    def __init__(self, clock, script):
+        self.clock = clock
+        self.script = list(script)
+        self.calls = []
+
+    async def __call__(self, prompt):
+        self.calls.append(self.clock.now)
+        outcome = self.script.pop(0) if self.script else "ok"
+        if isinstance(outcome, Exception):
+            raise outcome
+        if isinstance(outcome, tuple):
+            seconds, outcome = outcome
+            self.clock.now += seconds
+        return outcome
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(llm_scheduler, "time", clock)
+    monkeypatch.setattr(asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def make_scheduler(backend, **options):
+    options = {"attempts": 1, "breaker_threshold": 2, "breaker_cooldown": 30, **options}
+    return LLMScheduler(backend, **options)
+
+
+def test_breaker_opens_after_consecutive_failures(clock):
+    llm = FakeLLM(clock, [FakeProviderError(503), FakeProviderError(503)])
+    scheduler = make_scheduler(llm)
+
+    for _ in range(2):
+        with pytest.raises(FakeProviderError):
+            asyncio.run(scheduler.generate("prompt"))
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(scheduler.generate("prompt"))
+    assert len(llm.calls) == 2  # rejected without calling the provider
+
+
+def test_non_retryable_errors_do_not_open_the_breaker(clock):
+    llm = FakeLLM(clock, [ValueError("bad json")] * 3)
+    scheduler = make_scheduler(llm)
+
+    for _ in range(3):
+        with pytest.raises(ValueError):
+            asyncio.run(scheduler.generate("prompt"))
+    assert len(llm.calls) == 3
+
+
+def test_half_open_probe_closes_breaker_on_success(clock):
+    llm = FakeLLM(clock, [FakeProviderError(429), FakeProviderError(429), "recovered", "ok"])
+    scheduler = make_scheduler(llm)
+    for _ in range(2):
+        with pytest.raises(FakeProviderError):
+            asyncio.run(scheduler.generate("prompt"))
+
+    clock.now += 31
+    assert asyncio.run(scheduler.generate("prompt")) == "recovered"
+    assert asyncio.run(scheduler.generate("prompt")) == "ok"
+
+
+def test_half_open_probe_failure_reopens_breaker(clock):
+    llm = FakeLLM(clock, [FakeProviderError(503)] * 3)
+    scheduler = make_scheduler(llm)
+    for _ in range(2):
+        with pytest.raises(FakeProviderError):
+            asyncio.run(scheduler.generate("prompt"))
+
+    clock.now += 31
+    with pytest.raises(FakeProviderError):
+        asyncio.run(scheduler.generate("prompt"))
+    # A failed probe starts a whole new cooldown.
+    clock.now += 10
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(scheduler.generate("prompt"))
+    assert len(llm.calls) == 3
+
+
+def test_half_open_lets_only_one_probe_through(clock):
+    release = asyncio.Event()
+
+    async def backend(prompt):
+        await release.wait()
+        return "probe"
+
+    scheduler = make_scheduler(backend)
+    scheduler._record(healthy=False)
+    scheduler._record(healthy=False)
+    clock.now += 31
+
+    async def race():
+        probe = asyncio.create_task(scheduler.generate("prompt"))
+        await _real_sleep(0)
+        with pytest.raises(LLMUnavailable):
+            await scheduler.generate("prompt")
+        release.set()
+        return await probe
+
+    assert asyncio.run(race()) == "probe"
+
+
+def test_slow_successes_open_the_breaker(clock):
+    llm = FakeLLM(clock, [(25, "slow"), (25, "slow")])
+    scheduler = make_scheduler(llm, slow_call_seconds=20)
+
+    assert asyncio.run(scheduler.generate("prompt")) == "slow"
+    assert asyncio.run(scheduler.generate("prompt")) == "slow"
+    with pytest.raises(LLMUnavailable):
+        asyncio.run(scheduler.generate("prompt"))
+
+
+def test_token_budget_waits_for_the_window_to_roll(clock):
+    llm = FakeLLM(clock, ["first", "second"])
+    scheduler = make_scheduler(llm, tokens_per_minute=3000, output_token_estimate=2000)
+
+    async def both():
+        return await asyncio.gather(scheduler.generate("prompt"), scheduler.generate("prompt"))
+
+    assert asyncio.run(both()) == ["first", "second"]
+    # The second call waited for the first one's tokens to leave the window.
+    assert clock.sleeps == [pytest.approx(60)]
+
+
+def test_oversized_request_goes_through_on_an_empty_window(clock):
+    llm = FakeLLM(clock, ["big"])
+    scheduler = make_scheduler(llm, tokens_per_minute=100, output_token_estimate=2000)
+
+    assert asyncio.run(scheduler.generate("prompt")) == "big"
+    assert clock.sleeps == []
+
+
+def test_retries_use_capped_exponential_jitter(clock, monkeypatch):
+    monkeypatch.setattr(llm_scheduler.random, "uniform", lambda low, high: high)
+    llm = FakeLLM(clock, [FakeProviderError(503)] * 3 + ["ok"])
+    scheduler = make_scheduler(llm, attempts=4, backoff_base=0.5, backoff_cap=1.5, breaker_threshold=10)
+
+    assert asyncio.run(scheduler.generate("prompt")) == "ok"
+    assert clock.sleeps == [1.0, 1.5, 1.5]
+
+
+def test_retry_delays_are_jittered(clock):
+    llm = FakeLLM(clock, [FakeProviderError(503)] * 40)
+    scheduler = make_scheduler(llm, attempts=2, backoff_base=0.5, breaker_threshold=100)
+
+    for _ in range(20):
+        with pytest.raises(FakeProviderError):
+            asyncio.run(scheduler.generate("prompt"))
+    assert len(clock.sleeps) == 20
+    assert all(0 <= delay <= 1.0 for delay in clock.sleeps)
+    assert len(set(clock.sleeps)) > 1
+
+
+def test_gives_up_after_the_last_attempt(clock):
+    llm = FakeLLM(clock, [FakeProviderError(503)] * 3)
+    scheduler = make_scheduler(llm, attempts=3, breaker_threshold=10)
+
+    with pytest.raises(FakeProviderError):
+        asyncio.run(scheduler.generate("prompt"))
+    assert len(llm.calls) == 3